@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from vrp_vns_optimizer import read_cvrp_instance, variable_neighborhood_search
+
+# === Benchmark del VNS ===
+# python vrp_benchmark.py --semillas 5 --guardar-baseline baseline.json
+# python vrp_benchmark.py --semillas 5 --comparar baseline.json
+# python vrp_benchmark.py --solo-arranque --comparar baseline.json
+# Resuelve cada instancia con varias semillas (una corrida tras otra, para que los tiempos no se
+# interfieran) y reporta el gap al mejor conocido de COMMENT, el tiempo hasta alcanzar cada gap
+# objetivo, el tiempo de cada operador y los movimientos evaluados por segundo. También mide cuánto
+# tarda `import vrp_vns_optimizer` en un intérprete nuevo y qué módulos pesados arrastra.
+_DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+_INSTANCIAS = [os.path.join(_DIRECTORIO, nombre) for nombre in ("Facil.txt", "Medio.txt", "Dificil.txt")]
+_VERSION_BASELINE = 1
+
+# --- Tiempo de arranque ---
+# Importar el solver no debe cargar estos módulos: cada proceso worker pagaría su importación
+_MODULOS_PESADOS = ("numpy", "matplotlib", "multiprocessing", "concurrent.futures", "argparse")
+_SCRIPT_ARRANQUE = (
+    "import json, sys, time\n"
+    "inicio = time.perf_counter()\n"
+    "import vrp_vns_optimizer\n"
+    "duracion = time.perf_counter() - inicio\n"
+    "print(json.dumps({'tiempo': duracion, 'modulos': [m for m in %r if m in sys.modules]}))\n"
+) % (_MODULOS_PESADOS,)
+
+def _percentil(valores, p):
+    # Percentil p (0-100) con interpolación lineal entre los valores ordenados
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    posicion = (len(ordenados) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicion - inferior)
+
+def _corrida(dist_matrix, instancia, semilla, opciones_vns):
+    # Una búsqueda con la trayectoria (tiempo, costo) de cada nuevo mejor global
+    trayectoria = []
+    def registrar(progreso):
+        trayectoria.append((progreso.tiempo, progreso.costo))
+
+    random.seed(semilla)
+    inicio = time.perf_counter()
+    resultado = variable_neighborhood_search(dist_matrix, instancia.demands, instancia.capacidad,
+                                             verbose=False, callback=registrar, coords=instancia.coords,
+                                             **opciones_vns)
+    return {"semilla": semilla, "costo": resultado.costo, "tiempo": time.perf_counter() - inicio,
+            "iteraciones": resultado.iteraciones, "trayectoria": trayectoria,
+            "operadores": resultado.estadisticas}
+
+def _tiempo_a_objetivo(trayectoria, costo_objetivo):
+    for tiempo, costo in trayectoria:
+        if costo <= costo_objetivo:
+            return tiempo
+    return None
+
+def medir_instancia(ruta, semillas, opciones_vns, objetivos, percentiles):
+    instancia = read_cvrp_instance(ruta)
+    dist_matrix = instancia.distancias()
+    mejor_conocido = instancia.mejor_conocido
+    corridas = [_corrida(dist_matrix, instancia, semilla, opciones_vns) for semilla in semillas]
+
+    costos = [corrida["costo"] for corrida in corridas]
+    resumen = {
+        "mejor_conocido": mejor_conocido,
+        "costos": costos,
+        "tiempo_mediana": statistics.median(corrida["tiempo"] for corrida in corridas),
+    }
+    if mejor_conocido:
+        gaps = [100 * (costo - mejor_conocido) / mejor_conocido for costo in costos]
+        resumen["gaps"] = gaps
+        resumen["gap_mediana"] = statistics.median(gaps)
+        resumen["gap_percentiles"] = {f"{p:g}": _percentil(gaps, p) for p in percentiles}
+        # Curva tiempo-a-objetivo: por gap objetivo, los tiempos (ordenados) de las corridas que lo alcanzaron
+        resumen["tiempo_a_objetivo"] = {}
+        for objetivo in objetivos:
+            costo_objetivo = mejor_conocido * (1 + objetivo / 100)
+            tiempos = [_tiempo_a_objetivo(corrida["trayectoria"], costo_objetivo) for corrida in corridas]
+            alcanzados = sorted(t for t in tiempos if t is not None)
+            resumen["tiempo_a_objetivo"][f"{objetivo:g}"] = {
+                "alcanzado": len(alcanzados) / len(corridas),
+                "tiempos": alcanzados,
+                "tiempo_mediana": statistics.median(alcanzados) if alcanzados else None,
+            }
+
+    operadores = {}
+    for corrida in corridas:
+        for nombre, registro in corrida["operadores"].items():
+            total = operadores.setdefault(nombre, {"tiempo": 0.0, "evaluados": 0, "mejoras": 0})
+            total["tiempo"] += registro["tiempo"]
+            total["evaluados"] += registro["evaluados"]
+            total["mejoras"] += registro["mejoras"]
+    for total in operadores.values():
+        total["movimientos_por_segundo"] = total["evaluados"] / total["tiempo"] if total["tiempo"] else None
+    resumen["operadores"] = operadores
+    tiempo_operadores = sum(total["tiempo"] for total in operadores.values())
+    evaluados = sum(total["evaluados"] for total in operadores.values())
+    resumen["movimientos_por_segundo"] = evaluados / tiempo_operadores if tiempo_operadores else None
+    return instancia.nombre, resumen
+
+def medir_arranque(repeticiones=10):
+    # Tiempo de `import vrp_vns_optimizer` en intérpretes nuevos (mediana) y módulos pesados que carga
+    tiempos = []
+    modulos = set()
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, "-c", _SCRIPT_ARRANQUE], cwd=_DIRECTORIO,
+                                capture_output=True, text=True, check=True).stdout
+        medicion = json.loads(salida)
+        tiempos.append(medicion["tiempo"])
+        modulos.update(medicion["modulos"])
+    return {"importacion_mediana": statistics.median(tiempos), "importacion_max": max(tiempos),
+            "modulos_pesados": sorted(modulos)}
+
+def comparar(actual, baseline, tolerancia_gap, tolerancia_velocidad, tolerancia_arranque=0.5):
+    # Devuelve la lista de regresiones: gap mediano peor en más de `tolerancia_gap` puntos porcentuales,
+    # o movimientos por segundo (total y por operador) bajo (1 - tolerancia_velocidad) veces el baseline.
+    # En el arranque: cualquier módulo pesado cargado al importar, o una importación más de
+    # (1 + tolerancia_arranque) veces más lenta (con 5 ms de margen para el ruido de medición)
+    regresiones = []
+    arranque = actual.get("arranque")
+    if arranque is not None:
+        if arranque["modulos_pesados"]:
+            regresiones.append(f"arranque: importar el solver carga {', '.join(arranque['modulos_pesados'])}")
+        previo = baseline.get("arranque")
+        if previo is not None:
+            limite = previo["importacion_mediana"] * (1 + tolerancia_arranque) + 0.005
+            if arranque["importacion_mediana"] > limite:
+                regresiones.append(f"arranque: importación {previo['importacion_mediana'] * 1000:.1f} ms -> "
+                                   f"{arranque['importacion_mediana'] * 1000:.1f} ms")
+    for nombre, previo in baseline["instancias"].items():
+        nuevo = actual["instancias"].get(nombre)
+        if nuevo is None:
+            continue
+        if previo.get("gap_mediana") is not None and nuevo.get("gap_mediana") is not None:
+            if nuevo["gap_mediana"] > previo["gap_mediana"] + tolerancia_gap:
+                regresiones.append(f"{nombre}: gap mediano {previo['gap_mediana']:.3f}% -> {nuevo['gap_mediana']:.3f}%")
+        velocidades = [("total", previo["movimientos_por_segundo"], nuevo["movimientos_por_segundo"])]
+        for operador, registro in previo["operadores"].items():
+            if operador in nuevo["operadores"]:
+                velocidades.append((operador, registro["movimientos_por_segundo"],
+                                    nuevo["operadores"][operador]["movimientos_por_segundo"]))
+        for etiqueta, antes, ahora in velocidades:
+            if antes and ahora is not None and ahora < antes * (1 - tolerancia_velocidad):
+                regresiones.append(f"{nombre}: movimientos/s de {etiqueta} {antes:,.0f} -> {ahora:,.0f}")
+    return regresiones
+
+def _imprimir(resultados):
+    arranque = resultados.get("arranque")
+    if arranque is not None:
+        pesados = ", ".join(arranque["modulos_pesados"]) or "ninguno"
+        print(f"--- Arranque: import en {arranque['importacion_mediana'] * 1000:.1f} ms (mediana), "
+              f"módulos pesados cargados: {pesados} ---")
+    for nombre, resumen in resultados["instancias"].items():
+        print(f"--- {nombre} (mejor conocido: {resumen['mejor_conocido']}) ---")
+        if "gaps" in resumen:
+            percentiles = ", ".join(f"p{p}: {valor:.3f}%" for p, valor in resumen["gap_percentiles"].items())
+            print(f"  Gap mediano: {resumen['gap_mediana']:.3f}% ({percentiles})")
+            for objetivo, curva in resumen["tiempo_a_objetivo"].items():
+                mediana = f"{curva['tiempo_mediana']:.2f}s" if curva["tiempo_mediana"] is not None else "-"
+                print(f"  Gap <= {objetivo}%: {curva['alcanzado']:.0%} de las corridas, tiempo mediano {mediana}")
+        print(f"  Tiempo mediano por corrida: {resumen['tiempo_mediana']:.2f}s, "
+              f"movimientos/s: {resumen['movimientos_por_segundo'] or 0:,.0f}")
+        for operador, total in resumen["operadores"].items():
+            print(f"    {operador:<14} {total['tiempo']:8.2f}s {total['evaluados']:>12,} evaluados "
+                  f"{total['movimientos_por_segundo'] or 0:>12,.0f} mov/s {total['mejoras']:>6} mejoras")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del VNS sobre instancias con mejor conocido en COMMENT.")
+    parser.add_argument("instancias", nargs="*", default=_INSTANCIAS)
+    parser.add_argument("--semillas", type=int, default=5, help="corridas por instancia (semillas 0..N-1)")
+    parser.add_argument("--max-iter", type=int, default=100)
+    parser.add_argument("--tiempo-limite", type=float, default=None, help="segundos por corrida")
+    parser.add_argument("--constructor", default="random")
+    parser.add_argument("--vecinos-cercanos", type=int, default=None)
+    parser.add_argument("--objetivos", default="5,2,1", help="gaps objetivo en %% para las curvas tiempo-a-objetivo")
+    parser.add_argument("--percentiles", default="10,90")
+    parser.add_argument("--guardar-baseline", default=None, help="escribe los resultados en este archivo JSON")
+    parser.add_argument("--comparar", default=None, help="baseline JSON contra el que se buscan regresiones")
+    parser.add_argument("--tolerancia-gap", type=float, default=0.5, help="puntos porcentuales de gap mediano")
+    parser.add_argument("--tolerancia-velocidad", type=float, default=0.2,
+                        help="caída relativa de movimientos/s tolerada")
+    parser.add_argument("--tolerancia-arranque", type=float, default=0.5,
+                        help="aumento relativo tolerado del tiempo de importación")
+    parser.add_argument("--repeticiones-arranque", type=int, default=10,
+                        help="intérpretes nuevos usados para medir el arranque (0 lo omite)")
+    parser.add_argument("--solo-arranque", action="store_true", help="mide solo el tiempo de arranque")
+    args = parser.parse_args(argv)
+
+    opciones_vns = {"max_iter": args.max_iter, "tiempo_limite": args.tiempo_limite,
+                    "constructor": args.constructor, "vecinos_cercanos": args.vecinos_cercanos}
+    objetivos = [float(valor) for valor in args.objetivos.split(",") if valor]
+    percentiles = [float(valor) for valor in args.percentiles.split(",") if valor]
+    semillas = list(range(args.semillas))
+
+    resultados = {"version": _VERSION_BASELINE, "configuracion": dict(opciones_vns, semillas=semillas),
+                  "instancias": {}}
+    if args.repeticiones_arranque > 0:
+        resultados["arranque"] = medir_arranque(args.repeticiones_arranque)
+    for ruta in [] if args.solo_arranque else args.instancias:
+        nombre, resumen = medir_instancia(ruta, semillas, opciones_vns, objetivos, percentiles)
+        resultados["instancias"][nombre] = resumen
+    _imprimir(resultados)
+
+    if args.guardar_baseline:
+        with open(args.guardar_baseline, 'w') as f:
+            json.dump(resultados, f, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get("configuracion") != resultados["configuracion"]:
+            print("Aviso: la configuración del baseline es distinta de la de esta corrida")
+        regresiones = comparar(resultados, baseline, args.tolerancia_gap, args.tolerancia_velocidad,
+                               args.tolerancia_arranque)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion}")
+        if regresiones:
+            return 1
+        print("Sin regresiones respecto del baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
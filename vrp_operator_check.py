@@ -0,0 +1,223 @@
+import argparse
+import os
+import random
+import sys
+
+from vrp_vns_optimizer import (_numpy, calculate_cost, fix_solution, generate_initial_solution, interchange,
+                               or_opt, read_cvrp_instance, relocate, swap, two_opt, two_opt_star)
+
+# === Verificación de los operadores ===
+# python vrp_operator_check.py
+# python vrp_operator_check.py Facil.txt --semillas 5 --pasos 20
+# Los operadores puntúan cada movimiento con el delta de las aristas que cambian y solo confirman con el
+# costo exacto los que compiten con el mejor. Este script los compara con la evaluación completa original
+# (cada vecino se copia y se evalúa con calculate_cost, y gana el primero de menor costo): a lo largo de
+# trayectorias desde soluciones aleatorias, cada operador debe elegir exactamente el mismo vecino. Or-opt,
+# interchange y 2-Opt* se comparan con una enumeración por fuerza bruta de su vecindario. Con NumPy
+# se repite sobre la matriz ndarray float64. Termina con código 1 ante cualquier diferencia.
+_DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+_INSTANCIAS = [os.path.join(_DIRECTORIO, nombre) for nombre in ("Facil.txt", "Medio.txt")]
+
+# --- Evaluación completa (operadores originales) ---
+def _relocate_completo(solucion, dist_matrix, demands, capacity):
+    mejor_solucion = [r[:] for r in solucion]
+    mejor_costo = calculate_cost(mejor_solucion, dist_matrix, demands, capacity)
+
+    for i in range(len(solucion)):
+      for j in range(1, len(solucion[i]) - 1):
+        cliente_a_mover = solucion[i][j]
+
+        for k in range(len(solucion)):
+          for l in range(1, len(solucion[k]) + 1):
+            if i==k and l == j:
+              continue
+
+            solucion_temp = [r[:] for r in solucion]
+            solucion_temp[i].pop(j) #elimina al cliente de su posicion original
+            if len(solucion_temp[i]) <= 1:
+              solucion_temp[i] = [0, 0]
+
+            solucion_temp[k].insert(l, cliente_a_mover)
+
+            ruta_i = sum(demands[node] for node in solucion_temp[i] if node != 0)
+            ruta_k = sum(demands[node] for node in solucion_temp[k] if node != 0)
+
+            if ruta_i <= capacity and ruta_k <= capacity:
+                        costo_actual = calculate_cost(solucion_temp, dist_matrix, demands, capacity)
+                        if costo_actual < mejor_costo:
+                            mejor_solucion = solucion_temp
+                            mejor_costo = costo_actual
+
+    return mejor_solucion
+
+def _swap_completo(solucion, dist_matrix, demands, capacidad):
+    # La rama entre rutas del original dejaba la solución igual (nunca mejora), así que se omite
+    mejor_solucion = [r[:] for r in solucion]
+    mejor_costo = calculate_cost(mejor_solucion, dist_matrix, demands, capacidad)
+
+    for r_idx, ruta in enumerate(solucion):
+        for i in range(1, len(ruta) - 1):
+            for j in range(i + 1, len(ruta) - 1):
+                solucion_temp = [r[:] for r in solucion]
+                solucion_temp[r_idx][i], solucion_temp[r_idx][j] = solucion_temp[r_idx][j], solucion_temp[r_idx][i]
+
+                demandaRuta = sum(demands[node] for node in solucion_temp[r_idx] if node != 0)
+                if demandaRuta <= capacidad:
+                    costoActual = calculate_cost(solucion_temp, dist_matrix, demands, capacidad)
+                    if costoActual < mejor_costo:
+                        mejor_solucion = solucion_temp
+                        mejor_costo = costoActual
+
+    return mejor_solucion
+
+def _two_opt_completo(solucion, dist_matrix, demands, capacidad):
+    mejor_solucion = [r[:] for r in solucion]
+    mejor_costo = calculate_cost(mejor_solucion, dist_matrix, demands, capacidad)
+
+    for r_idx, ruta in enumerate(solucion):
+        if len(ruta) < 4:
+            continue
+
+        for i in range(1, len(ruta) - 2):
+            for j in range(i + 1, len(ruta) - 1):
+                nuevaRuta = ruta[:i] + ruta[j:i-1:-1] + ruta[j+1:]
+
+                solucion_temp = [r[:] for r in solucion]
+                solucion_temp[r_idx] = nuevaRuta
+
+                costo_actual = calculate_cost(solucion_temp, dist_matrix, demands, capacidad)
+                if costo_actual < mejor_costo:
+                  mejor_solucion = solucion_temp
+                  mejor_costo = costo_actual
+
+    return mejor_solucion
+
+# --- Enumeración por fuerza bruta (or-opt, interchange, 2-Opt*) ---
+# Cada generador produce los vecinos como {índice de ruta: ruta nueva}, en el orden del vecindario del
+# operador; _mejor_vecino arma cada solución completa y se queda con la primera de menor costo.
+def _mejor_vecino(vecinos, solucion, dist_matrix, demands, capacidad):
+    mejor_solucion = [r[:] for r in solucion]
+    mejor_costo = calculate_cost(mejor_solucion, dist_matrix, demands, capacidad)
+
+    for cambios in vecinos:
+        if any(sum(demands[node] for node in ruta if node != 0) > capacidad for ruta in cambios.values()):
+            continue
+        solucion_temp = [cambios.get(idx, ruta)[:] for idx, ruta in enumerate(solucion)]
+        costo_actual = calculate_cost(solucion_temp, dist_matrix, demands, capacidad)
+        if costo_actual < mejor_costo:
+            mejor_solucion = solucion_temp
+            mejor_costo = costo_actual
+
+    return mejor_solucion
+
+def _vecinos_or_opt(solucion):
+    # Cada segmento de 1 a 3 clientes, en cada posición de cada ruta (la suya, sin el segmento), en su
+    # sentido y, si tiene más de un cliente, invertido
+    for r_idx, ruta in enumerate(solucion):
+        for largo in (1, 2, 3):
+            for i in range(1, len(ruta) - largo):
+                segmento = ruta[i:i+largo]
+                sin_segmento = ruta[:i] + ruta[i+largo:]
+                for k, ruta_k in enumerate(solucion):
+                    base = sin_segmento if k == r_idx else ruta_k
+                    for l in range(1, len(base)):
+                        for insertado in (segmento, segmento[::-1]) if largo > 1 else (segmento,):
+                            cambios = {r_idx: sin_segmento}
+                            cambios[k] = base[:l] + insertado + base[l:]
+                            yield cambios
+
+def _vecinos_entre_rutas(solucion, invertido):
+    # Cada par de rutas no vacías cortado en cada par de posiciones (i clientes de la primera, j de la
+    # segunda). Sin invertir se intercambian las colas (interchange); invirtiendo, la cabeza de la primera
+    # sigue con la cabeza invertida de la segunda y la cola invertida de la primera con la cola de la segunda
+    for r1_idx in range(len(solucion)):
+        for r2_idx in range(r1_idx + 1, len(solucion)):
+            nodo_1 = solucion[r1_idx][1:-1]
+            nodo_2 = solucion[r2_idx][1:-1]
+            if not nodo_1 or not nodo_2:
+                continue
+            for i in range(len(nodo_1) + 1):
+                for j in range(len(nodo_2) + 1):
+                    if invertido:
+                        nueva_1 = nodo_1[:i] + nodo_2[:j][::-1]
+                        nueva_2 = nodo_1[i:][::-1] + nodo_2[j:]
+                    else:
+                        nueva_1 = nodo_1[:i] + nodo_2[j:]
+                        nueva_2 = nodo_2[:j] + nodo_1[i:]
+                    yield {r1_idx: [0] + nueva_1 + [0], r2_idx: [0] + nueva_2 + [0]}
+
+def _or_opt_enumerado(solucion, dist_matrix, demands, capacidad):
+    return _mejor_vecino(_vecinos_or_opt(solucion), solucion, dist_matrix, demands, capacidad)
+
+def _interchange_enumerado(solucion, dist_matrix, demands, capacidad):
+    return _mejor_vecino(_vecinos_entre_rutas(solucion, False), solucion, dist_matrix, demands, capacidad)
+
+def _two_opt_star_enumerado(solucion, dist_matrix, demands, capacidad):
+    return _mejor_vecino(_vecinos_entre_rutas(solucion, True), solucion, dist_matrix, demands, capacidad)
+
+_OPERADORES = (
+    ("relocate", relocate, _relocate_completo),
+    ("swap", swap, _swap_completo),
+    ("two_opt", two_opt, _two_opt_completo),
+    ("interchange", interchange, _interchange_enumerado),
+    ("or_opt", or_opt, _or_opt_enumerado),
+    ("two_opt_star", two_opt_star, _two_opt_star_enumerado),
+)
+
+# --- Comparación ---
+def verificar_instancia(ruta, semillas, pasos):
+    # Devuelve (comparaciones, diferencias). En cada paso todos los operadores parten de la misma solución;
+    # la trayectoria avanza con la mejora de un operador distinto en cada paso, hasta un óptimo local
+    instancia = read_cvrp_instance(ruta)
+    demands, capacidad = instancia.demands, instancia.capacidad
+    matrices = {"python": instancia.distancias()}
+    if _numpy() is not None:
+        matrices["numpy"] = instancia.distancias("numpy")
+    nombre_instancia = os.path.basename(ruta)
+    comparaciones = 0
+    diferencias = []
+
+    for semilla in semillas:
+        random.seed(semilla)
+        solucion = generate_initial_solution(demands, capacidad)
+        solucion = fix_solution(solucion, len(demands) - 1, demands, capacidad, matrices["python"])
+        for paso in range(pasos):
+            costo = calculate_cost(solucion, matrices["python"], demands, capacidad)
+            mejoras = []
+            for nombre, operador, completo in _OPERADORES:
+                esperado = completo(solucion, matrices["python"], demands, capacidad)
+                for backend, dist_matrix in matrices.items():
+                    comparaciones += 1
+                    if operador(solucion, dist_matrix, demands, capacidad) != esperado:
+                        diferencias.append(f"{nombre_instancia} semilla={semilla} paso={paso} {nombre} ({backend})")
+                if calculate_cost(esperado, matrices["python"], demands, capacidad) < costo:
+                    mejoras.append(esperado)
+            if not mejoras:
+                break
+            solucion = mejoras[paso % len(mejoras)]
+    return comparaciones, diferencias
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara los operadores con la evaluación completa original.")
+    parser.add_argument("instancias", nargs="*", default=_INSTANCIAS)
+    parser.add_argument("--semillas", type=int, default=3, help="trayectorias por instancia (semillas 0..N-1)")
+    parser.add_argument("--pasos", type=int, default=10, help="movimientos máximos por trayectoria")
+    args = parser.parse_args(argv)
+
+    total = 0
+    diferencias = []
+    for ruta in args.instancias:
+        comparaciones, encontradas = verificar_instancia(ruta, range(args.semillas), args.pasos)
+        print(f"{os.path.basename(ruta)}: {comparaciones} comparaciones, {len(encontradas)} diferencias")
+        total += comparaciones
+        diferencias.extend(encontradas)
+
+    for diferencia in diferencias:
+        print(f"DIFERENCIA {diferencia}")
+    if diferencias:
+        return 1
+    print(f"Los operadores eligen el mismo vecino que la evaluación completa en {total} comparaciones.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
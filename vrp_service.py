@@ -0,0 +1,393 @@
+import asyncio
+import itertools
+import os
+import pickle
+import queue
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from vrp_vns_optimizer import (CVRPInstance, VNSProgress, _huella_instancia, _matriz_para_busqueda, _numpy,
+                               read_cvrp_instance, variable_neighborhood_search)
+
+# === Servicio asíncrono de resolución ===
+# Frente asyncio para variable_neighborhood_search: cada solicitud es un SolveJob que se puede esperar
+# (`await trabajo`), recorrer como iterador asíncrono de progreso (cada nuevo mejor global) y cancelar.
+#
+#     async with SolverService(ProcessBackend(max_workers=4)) as servicio:
+#         trabajo = servicio.enviar("Dificil.txt", semilla=1, plazo=30, max_iter=500)
+#         async for progreso in trabajo:
+#             print(progreso.iteracion, progreso.costo)
+#         resultado = await trabajo
+#
+# Cada trabajo es una tarea del backend, así que los trabajos corren en paralelo. Las solicitudes para la
+# misma instancia (mismo archivo sin modificar, o mismos datos) comparten una sola lectura: el servicio lee
+# la instancia y construye su matriz de distancias una vez por clave, y las solicitudes que llegan mientras
+# tanto esperan a esa preparación. ProcessBackend la deja en una carpeta temporal (la instancia en un pickle
+# y la matriz en un .npy, o en un pickle sin NumPy) y cada tarea lleva solo la clave y la ruta de la carpeta;
+# cada worker la carga una vez y guarda las últimas instancias usadas. La carpeta se borra cuando la
+# instancia sale de las últimas _MAX_INSTANCIAS_COMPARTIDAS del servicio sin trabajos pendientes.
+# ProcessBackend resuelve los trabajos en un pool de procesos; LocalBackend, en hilos de este proceso, con la
+# misma interfaz (sin pickling ni procesos hijos, para pruebas).
+#
+# Cancelación: `trabajo.cancelar()` detiene la búsqueda entre operadores del VND y el resultado es la mejor
+# solución hasta ese momento (motivo "cancelado"); si el trabajo aún no empezaba, esperarlo lanza
+# asyncio.CancelledError. Plazo: `plazo` segundos desde el envío, que incluyen la espera en cola; al empezar
+# se traduce en tiempo_limite, así que un trabajo vencido devuelve su solución inicial (motivo "tiempo").
+
+# --- Lado del worker ---
+_INSTANCIAS_WORKER = OrderedDict()
+_MAX_INSTANCIAS_WORKER = 4
+_CANDADO_INSTANCIAS = threading.Lock()
+_CANDADOS_CLAVE = {}
+
+def _cargar_compartida(carpeta):
+    # (instancia, matriz de distancias) de la carpeta que preparó ProcessBackend.compartir. El .npy se abre
+    # mapeado en memoria: una matriz float64 que cabe como listas se convierte, el resto se lee del archivo
+    with open(os.path.join(carpeta, "instancia.pickle"), 'rb') as f:
+        instancia = pickle.load(f)
+    ruta = os.path.join(carpeta, "matriz.npy")
+    if os.path.exists(ruta):
+        np = _numpy()
+        return instancia, _matriz_para_busqueda(np.asarray(np.load(ruta, mmap_mode="r")))
+    with open(os.path.join(carpeta, "matriz.pickle"), 'rb') as f:
+        return instancia, pickle.load(f)
+
+def _instancia_en_worker(clave, compartida):
+    # (instancia, matriz de distancias) de la caché del proceso, cargando la carpeta compartida solo si falta.
+    # LocalBackend entrega directamente la tupla, que ya es la misma para todos sus hilos
+    if not isinstance(compartida, str):
+        return compartida
+    with _CANDADO_INSTANCIAS:
+        datos = _INSTANCIAS_WORKER.get(clave)
+        if datos is not None:
+            _INSTANCIAS_WORKER.move_to_end(clave)
+            return datos
+        candado = _CANDADOS_CLAVE.setdefault(clave, threading.Lock())
+    with candado:
+        with _CANDADO_INSTANCIAS:
+            datos = _INSTANCIAS_WORKER.get(clave)
+        if datos is None:
+            datos = _cargar_compartida(compartida)
+            with _CANDADO_INSTANCIAS:
+                _INSTANCIAS_WORKER[clave] = datos
+                while len(_INSTANCIAS_WORKER) > _MAX_INSTANCIAS_WORKER:
+                    _CANDADOS_CLAVE.pop(_INSTANCIAS_WORKER.popitem(last=False)[0], None)
+    return datos
+
+def _sondeo_cancelacion(evento, intervalo=0.05):
+    # Consultar un Event de un Manager es un viaje de ida y vuelta al proceso gestor: se consulta como
+    # mucho una vez cada `intervalo` segundos, y una vez cancelado ya no se vuelve a consultar
+    estado = {"proxima": 0.0, "cancelado": False}
+    def detener():
+        ahora = time.perf_counter()
+        if not estado["cancelado"] and ahora >= estado["proxima"]:
+            estado["proxima"] = ahora + intervalo
+            estado["cancelado"] = evento.is_set()
+        return estado["cancelado"]
+    return detener
+
+def _resolver_trabajo(clave, compartida, trabajo, canal, intervalo_progreso):
+    # Resuelve un trabajo sobre la instancia compartida del worker. Todo se informa por `canal` como
+    # (id, tipo, dato), con tipo "progreso", "resultado", "cancelado" o "error"
+    id_trabajo, semilla, limite_reloj, opciones, cancelado = trabajo
+    if cancelado.is_set():
+        canal.put((id_trabajo, "cancelado", None))
+        return
+    try:
+        instancia, dist_matrix = _instancia_en_worker(clave, compartida)
+    except Exception as error:
+        canal.put((id_trabajo, "error", error))
+        return
+
+    opciones = dict(opciones)
+    if limite_reloj is not None:
+        restante = max(0.0, limite_reloj - time.time())
+        if opciones.get("tiempo_limite") is None or opciones["tiempo_limite"] > restante:
+            opciones["tiempo_limite"] = restante
+
+    # Solo se envía un mejor global cada `intervalo_progreso` segundos; el resultado trae el último
+    ultimo_envio = [None]
+    def callback(progreso):
+        ahora = time.perf_counter()
+        if ultimo_envio[0] is None or ahora - ultimo_envio[0] >= intervalo_progreso:
+            ultimo_envio[0] = ahora
+            canal.put((id_trabajo, "progreso", progreso._replace(estadisticas=None)))
+
+    try:
+        random.seed(semilla)
+        resultado = variable_neighborhood_search(dist_matrix, instancia.demands, instancia.capacidad,
+                                                 verbose=False, callback=callback, coords=instancia.coords,
+                                                 detener=_sondeo_cancelacion(cancelado), **opciones)
+    except Exception as error:
+        canal.put((id_trabajo, "error", error))
+        return
+    canal.put((id_trabajo, "resultado", resultado))
+
+# --- Backends ---
+# Un backend entrega el canal de mensajes de los workers, crea los eventos de cancelación, prepara una
+# instancia para compartirla entre trabajos (`compartir` / `liberar`) y ejecuta `_resolver_trabajo`
+# devolviendo un concurrent.futures.Future
+def _leer_instancia(instancia):
+    if isinstance(instancia, CVRPInstance):
+        return instancia
+    return read_cvrp_instance(instancia)
+
+class ProcessBackend:
+    def __init__(self, max_workers=None):
+        # Los workers se crean con "forkserver" (o "spawn"): el servicio tiene hilos y fork con hilos no es
+        # seguro. Importar el solver es liviano, así que arrancar un worker es barato
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        metodos = multiprocessing.get_all_start_methods()
+        contexto = multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+        self._gestor = contexto.Manager()
+        self.canal = self._gestor.Queue()
+        self._pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), mp_context=contexto)
+        self._directorio = tempfile.mkdtemp(prefix="vrp_service-")
+
+    def evento(self):
+        return self._gestor.Event()
+
+    def compartir(self, instancia):
+        # Lee la instancia y construye su matriz una sola vez; devuelve la carpeta donde quedan
+        instancia = _leer_instancia(instancia)
+        matriz = instancia.distancias()
+        carpeta = tempfile.mkdtemp(dir=self._directorio)
+        datos = CVRPInstance(instancia.nombre, instancia.comentario, instancia.dimension, instancia.capacidad,
+                             instancia.coords, instancia.demands, instancia.depot, instancia.tipo_distancia)
+        with open(os.path.join(carpeta, "instancia.pickle"), 'wb') as f:
+            pickle.dump(datos, f, protocol=pickle.HIGHEST_PROTOCOL)
+        np = _numpy()
+        if np is not None:
+            np.save(os.path.join(carpeta, "matriz.npy"), np.asarray(matriz, dtype=np.float64))
+        else:
+            with open(os.path.join(carpeta, "matriz.pickle"), 'wb') as f:
+                pickle.dump(matriz, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return carpeta
+
+    def liberar(self, carpeta):
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    def ejecutar(self, funcion, *args):
+        return self._pool.submit(funcion, *args)
+
+    def cerrar(self):
+        self._pool.shutdown(wait=True)
+        self._gestor.shutdown()
+        shutil.rmtree(self._directorio, ignore_errors=True)
+
+class LocalBackend:
+    # Hilos de este proceso, que comparten una sola caché de instancias. Con más de un hilo, las semillas
+    # dejan de ser reproducibles porque el módulo `random` es compartido
+    def __init__(self, max_workers=1):
+        from concurrent.futures import ThreadPoolExecutor
+        self.canal = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def evento(self):
+        return threading.Event()
+
+    def compartir(self, instancia):
+        instancia = _leer_instancia(instancia)
+        return instancia, instancia.distancias()
+
+    def liberar(self, compartida):
+        pass
+
+    def ejecutar(self, funcion, *args):
+        return self._pool.submit(funcion, *args)
+
+    def cerrar(self):
+        self._pool.shutdown(wait=True)
+
+# --- Lado del servicio ---
+_MAX_INSTANCIAS_COMPARTIDAS = 8
+
+def _clave_instancia(instancia):
+    # Un archivo se identifica por su ruta, tamaño y fecha de modificación; una CVRPInstance, por sus datos
+    if isinstance(instancia, CVRPInstance):
+        return ("datos", _huella_instancia(instancia.coords, instancia.demands, instancia.capacidad))
+    ruta = os.path.abspath(instancia)
+    info = os.stat(ruta)
+    return ("ruta", ruta, info.st_size, info.st_mtime_ns)
+
+class SolveJob:
+    def __init__(self, id_trabajo, cancelado, loop):
+        self.id = id_trabajo
+        self.mejor = None # Último VNSProgress recibido
+        self._cancelado = cancelado
+        self._futuro = loop.create_future()
+        self._progreso = asyncio.Queue()
+
+    def cancelar(self):
+        self._cancelado.set()
+
+    def done(self):
+        return self._futuro.done()
+
+    async def resultado(self):
+        # VNSResult del trabajo; shield evita que cancelar la tarea que espera cancele el trabajo
+        return await asyncio.shield(self._futuro)
+
+    def __await__(self):
+        return self.resultado().__await__()
+
+    def __aiter__(self):
+        return self._iterar()
+
+    async def _iterar(self):
+        # Cada nuevo mejor global (sin estadísticas) hasta que el trabajo termina
+        while True:
+            progreso = await self._progreso.get()
+            if progreso is None:
+                return
+            yield progreso
+
+    def _nuevo_progreso(self, progreso):
+        self.mejor = progreso
+        self._progreso.put_nowait(progreso)
+
+    def _terminar(self, resultado=None, error=None, cancelado=False):
+        if cancelado:
+            self._futuro.cancel()
+        elif error is not None:
+            self._futuro.set_exception(error)
+        else:
+            # El envío de progreso está espaciado: el resultado puede traer un mejor global que no llegó
+            if self.mejor is None or resultado.costo < self.mejor.costo:
+                self._nuevo_progreso(VNSProgress(resultado.solucion, resultado.costo, resultado.iteraciones,
+                                                 resultado.tiempo, None))
+            self._futuro.set_result(resultado)
+        self._progreso.put_nowait(None)
+
+class SolverService:
+    def __init__(self, backend=None, intervalo_progreso=0.1):
+        # backend: ProcessBackend (por defecto) o LocalBackend
+        # intervalo_progreso: separación mínima (s) entre mensajes de progreso de un mismo trabajo
+        self._backend = backend if backend is not None else ProcessBackend()
+        self.intervalo_progreso = intervalo_progreso
+        self._ids = itertools.count(1)
+        self._trabajos = {}
+        self._compartidas = OrderedDict() # clave -> [futuro de backend.compartir, trabajos pendientes]
+        self._entradas = {} # id de trabajo -> su entrada de _compartidas
+        self._lanzamientos = set() # Tareas de _lanzar en curso (el loop solo guarda referencias débiles)
+        self._loop = None
+        self._lector = None
+
+    def _iniciar(self):
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._lector = threading.Thread(target=self._leer_canal, daemon=True)
+            self._lector.start()
+
+    def _leer_canal(self):
+        # Hilo que pasa los mensajes de los workers al loop de asyncio
+        while True:
+            mensaje = self._backend.canal.get()
+            if mensaje is None:
+                return
+            self._loop.call_soon_threadsafe(self._recibir, *mensaje)
+
+    def _recibir(self, id_trabajo, tipo, dato):
+        trabajo = self._trabajos.get(id_trabajo)
+        if trabajo is None:
+            return
+        if tipo == "progreso":
+            trabajo._nuevo_progreso(dato)
+            return
+        del self._trabajos[id_trabajo]
+        self._entradas.pop(id_trabajo)[1] -= 1
+        self._liberar_compartidas()
+        if tipo == "resultado":
+            trabajo._terminar(resultado=dato)
+        elif tipo == "cancelado":
+            trabajo._terminar(cancelado=True)
+        else:
+            trabajo._terminar(error=dato)
+
+    def enviar(self, instancia, semilla=0, plazo=None, **opciones_vns):
+        # instancia: ruta de un archivo TSPLIB/CVRPLIB o una CVRPInstance
+        # plazo: segundos desde ahora para entregar un resultado (incluye la espera en cola)
+        # opciones_vns: se pasan a variable_neighborhood_search (max_iter, tiempo_limite, constructor, ...)
+        self._iniciar()
+        clave = _clave_instancia(instancia)
+        trabajo = SolveJob(next(self._ids), self._backend.evento(), self._loop)
+        self._trabajos[trabajo.id] = trabajo
+        limite_reloj = time.time() + plazo if plazo is not None else None
+        entrada = self._compartir(clave, instancia)
+        self._entradas[trabajo.id] = entrada
+        tarea = self._loop.create_task(self._lanzar(trabajo, clave, entrada[0],
+                                                    (trabajo.id, semilla, limite_reloj, opciones_vns,
+                                                     trabajo._cancelado)))
+        self._lanzamientos.add(tarea)
+        tarea.add_done_callback(self._lanzamientos.discard)
+        return trabajo
+
+    def _compartir(self, clave, instancia):
+        # Entrada de la instancia compartida, preparándola en un hilo si no hay una (o si la anterior falló).
+        # La entrada cuenta los trabajos que aún la usan; no se libera mientras queden
+        entrada = self._compartidas.get(clave)
+        if entrada is None or (entrada[0].done() and entrada[0].exception() is not None):
+            futuro = self._loop.run_in_executor(None, self._backend.compartir, instancia)
+            entrada = self._compartidas[clave] = [futuro, 0]
+        self._compartidas.move_to_end(clave)
+        entrada[1] += 1
+        self._liberar_compartidas()
+        return entrada
+
+    def _liberar_compartidas(self):
+        # Libera las instancias más antiguas, sin trabajos pendientes, que sobran del máximo
+        for clave, (futuro, pendientes) in list(self._compartidas.items()):
+            if len(self._compartidas) <= _MAX_INSTANCIAS_COMPARTIDAS:
+                return
+            if pendientes == 0 and futuro.done():
+                del self._compartidas[clave]
+                if futuro.exception() is None:
+                    self._backend.liberar(futuro.result())
+
+    async def _lanzar(self, trabajo, clave, preparacion, datos_trabajo):
+        # Espera a que la instancia esté preparada y envía el trabajo al backend con la clave y lo compartido
+        try:
+            compartida = await asyncio.shield(preparacion)
+        except Exception as error:
+            self._recibir(trabajo.id, "error", error)
+            return
+        try:
+            futuro = self._backend.ejecutar(_resolver_trabajo, clave, compartida, datos_trabajo,
+                                            self._backend.canal, self.intervalo_progreso)
+        except Exception as error:
+            self._recibir(trabajo.id, "error", error)
+            return
+
+        def al_terminar(futuro, id_trabajo=trabajo.id):
+            # Si el worker murió (o la tarea no se pudo enviar), el trabajo falla por el canal, detrás de
+            # cualquier mensaje que alcanzó a enviar
+            error = futuro.exception()
+            if error is not None:
+                self._backend.canal.put((id_trabajo, "error", error))
+        futuro.add_done_callback(al_terminar)
+
+    async def cerrar(self, cancelar=False):
+        # Espera (o cancela) los trabajos en curso y libera el backend
+        if cancelar:
+            for trabajo in self._trabajos.values():
+                trabajo.cancelar()
+        if self._trabajos:
+            await asyncio.gather(*(trabajo._futuro for trabajo in list(self._trabajos.values())),
+                                 return_exceptions=True)
+        loop = asyncio.get_running_loop()
+        if self._lector is not None:
+            self._backend.canal.put(None)
+            await loop.run_in_executor(None, self._lector.join)
+        await loop.run_in_executor(None, self._backend.cerrar)
+
+    async def __aenter__(self):
+        self._iniciar()
+        return self
+
+    async def __aexit__(self, tipo, error, traza):
+        await self.cerrar(cancelar=error is not None)
@@ -1,63 +1,513 @@
+import abc
+import heapq
+import json
+import logging
 import math
+import os
 import random
-import re
-import statistics
-import matplotlib.pyplot as plt
-from collections import Counter
+import sys
+import time
+from collections import Counter, OrderedDict, namedtuple
+
+# Importar el módulo solo carga la biblioteca estándar liviana. NumPy, matplotlib (plot_solution), los
+# pools de procesos y el parser de la línea de comandos se importan dentro de las funciones que los usan.
+_logger = logging.getLogger("vrp_vns_optimizer")
+
+# NumPy es opcional: habilita la matriz de distancias vectorizada y la evaluación por lotes
+np = None
+_NUMPY_BUSCADO = False
+
+def _numpy():
+    # Devuelve el módulo numpy (importándolo la primera vez) o None si no está instalado
+    global np, _NUMPY_BUSCADO
+    if not _NUMPY_BUSCADO:
+        _NUMPY_BUSCADO = True
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = None
+    return np
 
 # === Función para leer archivo CVRP tipo .txt o .vrp ===
+# Devuelve (dimension, capacity, coords, demands, depot); read_cvrp_instance da además el tipo de
+# distancia, la matriz explícita si la hay y el comentario con la mejor solución conocida.
 def read_cvrp_file(filepath):
+    return read_cvrp_instance(filepath).como_tupla()
+
+# === Instancias TSPLIB / CVRPLIB ===
+# Versión de la caché binaria; cambiarla invalida las cachés escritas por versiones anteriores
+_VERSION_CACHE = 1
+
+# Formatos de EDGE_WEIGHT_SECTION: pares (i, j) en el orden en que aparecen los pesos. Como la matriz
+# es simétrica, cada formato por columnas recorre los mismos pares que su equivalente por filas.
+_FORMATOS_PESOS = {
+    "UPPER_ROW": lambda n: ((i, j) for i in range(n) for j in range(i + 1, n)),
+    "LOWER_ROW": lambda n: ((i, j) for i in range(n) for j in range(i)),
+    "UPPER_DIAG_ROW": lambda n: ((i, j) for i in range(n) for j in range(i, n)),
+    "LOWER_DIAG_ROW": lambda n: ((i, j) for i in range(n) for j in range(i + 1)),
+}
+_FORMATOS_PESOS["LOWER_COL"] = _FORMATOS_PESOS["UPPER_ROW"]
+_FORMATOS_PESOS["UPPER_COL"] = _FORMATOS_PESOS["LOWER_ROW"]
+_FORMATOS_PESOS["LOWER_DIAG_COL"] = _FORMATOS_PESOS["UPPER_DIAG_ROW"]
+_FORMATOS_PESOS["UPPER_DIAG_COL"] = _FORMATOS_PESOS["LOWER_DIAG_ROW"]
+
+class CVRPInstance:
+    __slots__ = ("nombre", "comentario", "dimension", "capacidad", "coords", "demands", "depot",
+                 "tipo_distancia", "matriz")
+
+    def __init__(self, nombre, comentario, dimension, capacidad, coords, demands, depot,
+                 tipo_distancia="EUC_2D", matriz=None):
+        self.nombre = nombre
+        self.comentario = comentario
+        self.dimension = dimension
+        self.capacidad = capacidad
+        self.coords = coords
+        self.demands = demands
+        self.depot = depot # índice 0-based
+        self.tipo_distancia = tipo_distancia # EDGE_WEIGHT_TYPE: EUC_2D, CEIL_2D, GEO o EXPLICIT
+        self.matriz = matriz # matriz explícita o precalculada (caché), si la hay
+
+    def como_tupla(self):
+        return self.dimension, self.capacidad, self.coords, self.demands, self.depot
+
+    @property
+    def mejor_conocido(self):
+        # Costo anotado en COMMENT ("1618.36" o "... Optimal value: 784)"), o None
+        texto = self.comentario.strip()
+        if "value" in texto.lower():
+            texto = texto.lower().rsplit("value", 1)[1]
+            for parte in texto.replace(":", " ").replace(")", " ").replace(",", " ").split():
+                try:
+                    return float(parte)
+                except ValueError:
+                    continue
+            return None
+        try:
+            return float(texto)
+        except ValueError:
+            return None
+
+    def distancias(self, backend="python", dtype="float64"):
+        # Matriz de distancias según EDGE_WEIGHT_TYPE, con los mismos backends que euclidean_distance_matrix
+        if self.matriz is not None:
+            matriz = self.matriz
+        elif self.tipo_distancia == "EUC_2D":
+            return euclidean_distance_matrix(self.coords, backend, dtype)
+        elif self.tipo_distancia == "CEIL_2D":
+            matriz = [[math.ceil(d) for d in fila] for fila in euclidean_distance_matrix(self.coords)]
+        elif self.tipo_distancia == "GEO":
+            matriz = _matriz_geo(self.coords)
+        else:
+            raise ValueError(f"Tipo de distancia no soportado: {self.tipo_distancia}")
+
+        if backend == "numpy":
+            if _numpy() is None:
+                raise ImportError("El backend 'numpy' requiere tener NumPy instalado")
+            return np.asarray(matriz, dtype=dtype)
+        if backend != "python":
+            raise ValueError(f"Backend de distancias desconocido: {backend}")
+        if _es_matriz_numpy(matriz):
+            return matriz.tolist()
+        return [fila[:] for fila in matriz]
+
+def _numero(texto):
+    try:
+        return int(texto)
+    except ValueError:
+        return float(texto)
+
+# TSPLIB define GEO con PI = 3.141592 (no math.pi); con otro valor cambian algunas distancias enteras
+_PI_TSPLIB = 3.141592
+
+def _matriz_geo(coords):
+    # Distancia GEO de TSPLIB: coordenadas DDD.MM (latitud, longitud) y kilómetros enteros
+    radianes = []
+    for x, y in coords:
+        grados_x, grados_y = int(x), int(y)
+        latitud = _PI_TSPLIB * (grados_x + 5.0 * (x - grados_x) / 3.0) / 180.0
+        longitud = _PI_TSPLIB * (grados_y + 5.0 * (y - grados_y) / 3.0) / 180.0
+        radianes.append((latitud, longitud))
+    matriz = []
+    for i, (lat_i, lon_i) in enumerate(radianes):
+        fila = []
+        for j, (lat_j, lon_j) in enumerate(radianes):
+            if i == j:
+                fila.append(0)
+                continue
+            q1 = math.cos(lon_i - lon_j)
+            q2 = math.cos(lat_i - lat_j)
+            q3 = math.cos(lat_i + lat_j)
+            fila.append(int(6378.388 * math.acos(0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3)) + 1.0))
+        matriz.append(fila)
+    return matriz
+
+def _matriz_explicita(pesos, n, formato):
+    if formato == "FULL_MATRIX":
+        if len(pesos) != n * n:
+            raise ValueError(f"EDGE_WEIGHT_SECTION tiene {len(pesos)} pesos; se esperaban {n * n}")
+        return [pesos[i * n:(i + 1) * n] for i in range(n)]
+    if formato not in _FORMATOS_PESOS:
+        raise ValueError(f"EDGE_WEIGHT_FORMAT no soportado: {formato}")
+
+    matriz = [[0] * n for _ in range(n)]
+    leidos = 0
+    for (i, j), peso in zip(_FORMATOS_PESOS[formato](n), pesos):
+        matriz[i][j] = matriz[j][i] = peso
+        leidos += 1
+    if leidos != len(pesos) or leidos != sum(1 for _ in _FORMATOS_PESOS[formato](n)):
+        raise ValueError(f"EDGE_WEIGHT_SECTION no coincide con el formato {formato} para {n} nodos")
+    return matriz
+
+def _parsear_tsplib(filepath):
+    # Lectura en una sola pasada, línea a línea, sin cargar el archivo completo
+    cabecera = {}
+    coords = {}
+    demandas = {}
+    depositos = []
+    pesos = []
+    seccion = None
+
     with open(filepath, 'r') as f:
-        lines = f.readlines()
-
-    dimension = 0
-    capacity = 0
-    coords = []
-    demands = []
-    depot = 0
-    section = None
-
-    for line in lines:
-        line = line.strip()
-        if "DIMENSION" in line:
-            dimension = int(line.split(":")[1])
-        elif "CAPACITY" in line:
-            capacity = int(line.split(":")[1])
-        elif line == "NODE_COORD_SECTION":
-            section = "coords"
-        elif line == "DEMAND_SECTION":
-            section = "demands"
-        elif line == "DEPOT_SECTION":
-            section = "depot"
-        elif line == "EOF":
-            break
-        elif section == "coords":
-            parts = line.split()
-            if len(parts) == 3:
-                node = int(parts[0])
-                x, y = int(parts[1]), int(parts[2])
-                coords.append((x, y))
-        elif section == "demands":
-            parts = line.split()
-            if len(parts) == 2:
-                node = int(parts[0])
-                demand = int(parts[1])
-                demands.append(demand)
-        elif section == "depot":
-            val = int(line)
-            if val != -1:
-                depot = val - 1 # Convertir a índice 0-based
-
-    return dimension, capacity, coords, demands, depot
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if seccion is not None and (line[0].isdigit() or line[0] in "-+."):
+                parts = line.split()
+                if seccion == "NODE_COORD_SECTION":
+                    coords[int(parts[0])] = (_numero(parts[1]), _numero(parts[2]))
+                elif seccion == "DEMAND_SECTION":
+                    demandas[int(parts[0])] = _numero(parts[1])
+                elif seccion == "DEPOT_SECTION":
+                    for parte in parts:
+                        if int(parte) != -1:
+                            depositos.append(int(parte) - 1) # Convertir a índice 0-based
+                elif seccion == "EDGE_WEIGHT_SECTION":
+                    pesos.extend(_numero(parte) for parte in parts)
+                continue # Datos de otras secciones (p. ej. DISPLAY_DATA_SECTION) se ignoran
+            if line == "EOF":
+                break
+
+            clave, _, valor = line.partition(":")
+            clave = clave.strip()
+            if clave.endswith("_SECTION"):
+                seccion = clave
+            else:
+                seccion = None
+                cabecera[clave] = valor.strip()
+
+    dimension = int(cabecera.get("DIMENSION", len(coords) or len(demandas)))
+    tipo_distancia = cabecera.get("EDGE_WEIGHT_TYPE", "EUC_2D")
+    matriz = None
+    if tipo_distancia == "EXPLICIT":
+        matriz = _matriz_explicita(pesos, dimension, cabecera.get("EDGE_WEIGHT_FORMAT", "FULL_MATRIX"))
+    elif tipo_distancia not in ("EUC_2D", "CEIL_2D", "GEO"):
+        raise ValueError(f"EDGE_WEIGHT_TYPE no soportado: {tipo_distancia}")
+
+    # Una sección ausente o corta fallaría mucho después, al indexar un nodo que no se leyó
+    secciones = [("DEMAND_SECTION", demandas)]
+    if tipo_distancia != "EXPLICIT":
+        secciones.append(("NODE_COORD_SECTION", coords))
+    for nombre_seccion, datos in secciones:
+        if not datos:
+            raise ValueError(f"{filepath}: falta {nombre_seccion}")
+        if len(datos) != dimension:
+            raise ValueError(f"{filepath}: {nombre_seccion} tiene {len(datos)} nodos; se esperaban {dimension}")
+
+    return CVRPInstance(
+        nombre=cabecera.get("NAME", os.path.splitext(os.path.basename(filepath))[0]),
+        comentario=cabecera.get("COMMENT", ""),
+        dimension=dimension,
+        capacidad=_numero(cabecera.get("CAPACITY", "0")),
+        coords=[coords[node] for node in sorted(coords)],
+        demands=[demandas[node] for node in sorted(demandas)],
+        depot=depositos[0] if depositos else 0,
+        tipo_distancia=tipo_distancia,
+        matriz=matriz,
+    )
+
+# --- Caché binaria (.npz) ---
+# Guarda coordenadas, demandas, metadatos y opcionalmente la matriz de distancias ya construida.
+# Es válida mientras el archivo de origen conserve su tamaño y fecha de modificación.
+def _firma_archivo(filepath):
+    info = os.stat(filepath)
+    return {"tamano": info.st_size, "mtime_ns": info.st_mtime_ns, "version": _VERSION_CACHE}
+
+def _leer_cache_instancia(ruta_cache, firma):
+    if not os.path.exists(ruta_cache):
+        return None
+    try:
+        with np.load(ruta_cache, allow_pickle=False) as datos:
+            metadatos = json.loads(str(datos["metadatos"]))
+            if metadatos.pop("firma") != firma:
+                return None
+            coords = datos["coords"].tolist()
+            demands = datos["demands"].tolist()
+            matriz = datos["matriz"] if "matriz" in datos.files else None
+    except (OSError, ValueError, KeyError):
+        return None # Caché ilegible: se vuelve a parsear
+    return CVRPInstance(coords=[tuple(c) for c in coords], demands=demands, matriz=matriz, **metadatos)
+
+def _escribir_cache_instancia(ruta_cache, instancia, firma, con_matriz):
+    metadatos = {"firma": firma, "nombre": instancia.nombre, "comentario": instancia.comentario,
+                 "dimension": instancia.dimension, "capacidad": instancia.capacidad,
+                 "depot": instancia.depot, "tipo_distancia": instancia.tipo_distancia}
+    arreglos = {"metadatos": np.array(json.dumps(metadatos)),
+                "coords": np.asarray(instancia.coords).reshape(len(instancia.coords), 2),
+                "demands": np.asarray(instancia.demands)}
+    if con_matriz or instancia.matriz is not None:
+        # La matriz se guarda tal como la construye el backend Python, para que los costos no cambien
+        arreglos["matriz"] = np.asarray(instancia.distancias(), dtype=np.float64)
+    temporal = f"{ruta_cache}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as f:
+        np.savez(f, **arreglos)
+    os.replace(temporal, ruta_cache)
+    if "matriz" in arreglos:
+        instancia.matriz = arreglos["matriz"]
+
+def read_cvrp_instance(filepath, cache=None, con_matriz=False):
+    # cache: None (sin caché), True (junto al archivo, `filepath + ".npz"`) o la ruta del .npz
+    # con_matriz: guarda también la matriz de distancias en la caché (instancia.matriz al releer)
+    if cache is None or cache is False:
+        return _parsear_tsplib(filepath)
+    if _numpy() is None:
+        raise ImportError("La caché binaria de instancias requiere tener NumPy instalado")
+
+    ruta_cache = filepath + ".npz" if cache is True else cache
+    firma = _firma_archivo(filepath)
+    instancia = _leer_cache_instancia(ruta_cache, firma)
+    if instancia is not None and (instancia.matriz is not None or not con_matriz):
+        return instancia
+    instancia = _parsear_tsplib(filepath)
+    _escribir_cache_instancia(ruta_cache, instancia, firma, con_matriz)
+    return instancia
 
 
 # === Calcular matriz de distancias euclidianas ===
-def euclidean_distance_matrix(coords):
+# backend="python" devuelve una lista de listas; backend="numpy" un ndarray del dtype pedido
+# (float32 reduce la memoria a la mitad: una matriz de 10k nodos ocupa ~400 MB).
+# Solo route_costs_batch y 2-Opt evalúan en lote sobre el ndarray; el resto de operadores lo indexa
+# elemento a elemento y es 2-3x más lento que con listas. vns_iter convierte a listas las matrices
+# float64 de hasta _MAX_NODOS_LISTA nodos; con float32 se ahorra memoria a costa de esa velocidad.
+def euclidean_distance_matrix(coords, backend="python", dtype="float64", filas_por_bloque=2048):
     n = len(coords)
-    return [[math.hypot(coords[i][0] - coords[j][0], coords[i][1] - coords[j][1]) for j in range(n)] for i in range(n)]
+    if backend == "python":
+        return [[math.hypot(coords[i][0] - coords[j][0], coords[i][1] - coords[j][1]) for j in range(n)] for i in range(n)]
+    if backend != "numpy":
+        raise ValueError(f"Backend de distancias desconocido: {backend}")
+    if _numpy() is None:
+        raise ImportError("El backend 'numpy' requiere tener NumPy instalado")
+
+    matriz = np.empty((n, n), dtype=dtype)
+    _llenar_matriz_numpy(matriz, coords, filas_por_bloque)
+    return matriz
+
+def _llenar_matriz_numpy(matriz, coords, filas_por_bloque):
+    xy = np.asarray(coords, dtype=np.float64).reshape(len(coords), 2)
+    # Difusión por bloques de filas para no materializar n x n x 2 temporales en instancias grandes
+    for inicio in range(0, len(xy), filas_por_bloque):
+        fin = min(inicio + filas_por_bloque, len(xy))
+        matriz[inicio:fin] = np.hypot(xy[inicio:fin, 0, None] - xy[None, :, 0],
+                                      xy[inicio:fin, 1, None] - xy[None, :, 1])
+
+# === Proveedores de distancias ===
+# calculate_cost y los operadores solo necesitan `dist_matrix[i][j]` y `len(dist_matrix)`, así que
+# cualquier objeto indexable por filas sirve como matriz. Los proveedores cubren tres casos:
+# matriz densa en memoria, matriz en disco (numpy.memmap) reutilizable entre ejecuciones, y
+# cálculo perezoso de cada distancia desde las coordenadas, sin guardar la matriz.
+class DistanceProvider(abc.ABC):
+    matriz = None # Matriz subyacente cuando existe completa (lista de listas o ndarray)
+
+    @abc.abstractmethod
+    def __len__(self):
+        pass
+
+    @abc.abstractmethod
+    def __getitem__(self, i):
+        pass
+
+    def distancia(self, i, j):
+        return self[i][j]
+
+class DenseDistances(DistanceProvider):
+    def __init__(self, matriz):
+        self.matriz = matriz
+
+    def __len__(self):
+        return len(self.matriz)
+
+    def __getitem__(self, i):
+        return self.matriz[i]
+
+class MemmapDistances(DistanceProvider):
+    # La matriz se construye una vez en `ruta_archivo` y se reabre en las siguientes ejecuciones
+    # mientras las coordenadas, el dtype y el backend coincidan (metadatos en `ruta_archivo + ".json"`).
+    # backend="python" llena cada fila con math.hypot, con los mismos valores que la matriz densa en Python
+    # (np.hypot difiere en el último bit en algunas distancias); "numpy" es más rápido de construir.
+    def __init__(self, coords, ruta_archivo, dtype="float32", filas_por_bloque=2048, backend="numpy"):
+        if _numpy() is None:
+            raise ImportError("MemmapDistances requiere tener NumPy instalado")
+        if backend not in ("numpy", "python"):
+            raise ValueError(f"Backend de distancias desconocido: {backend}")
+        n = len(coords)
+        metadatos = {"n": n, "dtype": np.dtype(dtype).name, "huella": _huella_coordenadas(coords),
+                     "backend": backend}
+        ruta_metadatos = ruta_archivo + ".json"
+
+        previos = None
+        if os.path.exists(ruta_archivo) and os.path.exists(ruta_metadatos):
+            with open(ruta_metadatos, 'r') as f:
+                previos = json.load(f)
+
+        if previos == metadatos:
+            self.matriz = np.memmap(ruta_archivo, dtype=dtype, mode='r', shape=(n, n))
+        else:
+            matriz = np.memmap(ruta_archivo, dtype=dtype, mode='w+', shape=(n, n))
+            if backend == "numpy":
+                _llenar_matriz_numpy(matriz, coords, filas_por_bloque)
+            else:
+                for i in range(n):
+                    x, y = coords[i][0], coords[i][1]
+                    matriz[i] = [math.hypot(x - c[0], y - c[1]) for c in coords]
+            matriz.flush()
+            del matriz
+            with open(ruta_metadatos, 'w') as f:
+                json.dump(metadatos, f)
+            self.matriz = np.memmap(ruta_archivo, dtype=dtype, mode='r', shape=(n, n))
+        self.ruta_archivo = ruta_archivo
+
+    def __getstate__(self):
+        # Al enviarse a otro proceso se reabre el archivo en lugar de copiar la matriz
+        return {"ruta_archivo": self.ruta_archivo, "dtype": self.matriz.dtype.name, "n": self.matriz.shape[0]}
+
+    def __setstate__(self, estado):
+        self.ruta_archivo = estado["ruta_archivo"]
+        self.matriz = np.memmap(estado["ruta_archivo"], dtype=estado["dtype"], mode='r',
+                                shape=(estado["n"], estado["n"]))
+
+    def __len__(self):
+        return self.matriz.shape[0]
+
+    def __getitem__(self, i):
+        return self.matriz[i]
+
+class _FilaPerezosa:
+    # Fila i de LazyDistances: cada `fila[j]` calcula una sola distancia, en O(1)
+    __slots__ = ("x", "y", "xs", "ys")
+
+    def __init__(self, x, y, xs, ys):
+        self.x = x
+        self.y = y
+        self.xs = xs
+        self.ys = ys
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __getitem__(self, j):
+        return math.hypot(self.x - self.xs[j], self.y - self.ys[j])
+
+class LazyDistances(DistanceProvider):
+    # EUC_2D calculado bajo demanda con math.hypot (los mismos valores que la matriz densa en Python).
+    # `dist[i][j]` no construye la fila: los operadores la indexan en O(1). Las filas completas solo se
+    # calculan para las listas de vecinos (`fila(i)`), y se guardan las `filas_en_cache` más recientes.
+    def __init__(self, coords, filas_en_cache=1024):
+        self.coords = [(c[0], c[1]) for c in coords]
+        self.filas_en_cache = filas_en_cache
+        self._xs = [c[0] for c in self.coords]
+        self._ys = [c[1] for c in self.coords]
+        self._filas = OrderedDict()
+        self._xy = np.asarray(self.coords, dtype=np.float64).reshape(len(coords), 2) if _numpy() is not None else None
+
+    def __len__(self):
+        return len(self.coords)
+
+    def __getitem__(self, i):
+        return _FilaPerezosa(self._xs[i], self._ys[i], self._xs, self._ys)
+
+    def fila(self, i):
+        # Fila completa (ndarray con NumPy, lista sin él), con caché LRU de filas
+        fila = self._filas.get(i)
+        if fila is not None:
+            self._filas.move_to_end(i)
+            return fila
+
+        if self._xy is not None:
+            fila = np.hypot(self._xy[:, 0] - self._xy[i, 0], self._xy[:, 1] - self._xy[i, 1])
+        else:
+            x, y = self.coords[i]
+            fila = [math.hypot(x - cx, y - cy) for cx, cy in self.coords]
+        self._filas[i] = fila
+        if len(self._filas) > self.filas_en_cache:
+            self._filas.popitem(last=False)
+        return fila
+
+    def distancia(self, i, j):
+        return math.hypot(self._xs[i] - self._xs[j], self._ys[i] - self._ys[j])
+
+def make_distance_provider(coords, proveedor="dense", **opciones):
+    # proveedor: "dense" (opciones de euclidean_distance_matrix), "memmap" (ruta_archivo, dtype) o "lazy" (filas_en_cache)
+    if proveedor == "dense":
+        return DenseDistances(euclidean_distance_matrix(coords, **opciones))
+    if proveedor == "memmap":
+        return MemmapDistances(coords, **opciones)
+    if proveedor == "lazy":
+        return LazyDistances(coords, **opciones)
+    raise ValueError(f"Proveedor de distancias desconocido: {proveedor}")
+
+def _huella_coordenadas(coords):
+    import hashlib
+    return hashlib.sha1(repr([(c[0], c[1]) for c in coords]).encode()).hexdigest()
+
+def _filas_distancia(dist_matrix):
+    # Con un proveedor que tiene la matriz completa, los bucles calientes la indexan directamente.
+    # Un np.memmap se desenvuelve a ndarray: indexar el memmap crea una subclase por cada acceso
+    if isinstance(dist_matrix, DistanceProvider) and dist_matrix.matriz is not None:
+        if _es_matriz_numpy(dist_matrix.matriz):
+            return np.asarray(dist_matrix.matriz)
+        return dist_matrix.matriz
+    return dist_matrix
+
+def _es_matriz_numpy(dist_matrix):
+    # Si nadie importó NumPy, ningún objeto puede ser un ndarray: no hace falta importarlo
+    modulo = sys.modules.get("numpy")
+    return modulo is not None and isinstance(dist_matrix, modulo.ndarray) and _numpy() is not None
+
+# Relocate, swap, interchange, or-opt y 2-Opt* leen la matriz elemento a elemento: sobre un ndarray
+# cada lectura crea un escalar de NumPy y una iteración es 2-3x más lenta que sobre listas.
+# Una matriz float64 de hasta _MAX_NODOS_LISTA nodos se convierte a listas una sola vez al empezar
+# la búsqueda (~n²·32 bytes, unos 290 MB con 3000 nodos); float32 o matrices mayores quedan como ndarray.
+_MAX_NODOS_LISTA = 3000
+
+def _matriz_para_busqueda(dist_matrix):
+    matriz = _filas_distancia(dist_matrix)
+    if _es_matriz_numpy(matriz) and matriz.dtype == np.float64 and len(matriz) <= _MAX_NODOS_LISTA:
+        return matriz.tolist()
+    return matriz
+
+# Costo de un lote de rutas con lecturas indexadas sobre los arreglos de aristas
+def route_costs_batch(rutas, dist_matrix):
+    if _numpy() is None:
+        raise ImportError("route_costs_batch requiere tener NumPy instalado")
+    matriz = np.asarray(dist_matrix)
+    largos = np.fromiter((len(ruta) for ruta in rutas), dtype=np.intp, count=len(rutas))
+    if not len(rutas):
+        return np.zeros(0, dtype=matriz.dtype)
+    nodos = np.concatenate([np.asarray(ruta, dtype=np.intp) for ruta in rutas])
+    costos_arista = matriz[nodos[:-1], nodos[1:]]
+    # La arista entre el final de una ruta y el inicio de la siguiente no cuenta
+    fin_ruta = np.cumsum(largos)[:-1] - 1
+    costos_arista[fin_ruta[fin_ruta >= 0]] = 0
+    inicios = np.concatenate(([0], np.cumsum(largos)[:-1]))
+    costos = np.zeros(len(rutas), dtype=costos_arista.dtype)
+    con_aristas = largos > 1
+    costos[con_aristas] = np.add.reduceat(costos_arista, inicios[con_aristas])
+    return costos
 
 # === Evaluar una solución ===
 def calculate_cost(solucion, dist_matrix, demands, capacidad):
+    dist_matrix = _filas_distancia(dist_matrix)
     costo_total = 0
     penalización = 0
 
@@ -81,8 +531,32 @@ def calculate_cost(solucion, dist_matrix, demands, capacidad):
 
     return costo_total + penalización
 
-# === Generar solución inicial greedy ===
-def generate_initial_solution(demands, capacity):
+# === Generar solución inicial ===
+# Todos reciben (demands, capacity, dist_matrix, coords, depot, vecinos) y devuelven rutas [0, ..., 0]
+def generate_initial_solution(demands, capacity, metodo="random", dist_matrix=None, coords=None, depot=0,
+                              vecinos_cercanos=None):
+    # metodo: "random" (clientes barajados y empaquetados en orden), "savings" (Clarke-Wright),
+    #         "sweep" (barrido polar alrededor del depósito) o "nearest_neighbor" (vecino más cercano)
+    # dist_matrix se necesita para "savings" y "nearest_neighbor"; coords y depot (el que devuelve
+    # read_cvrp_file) para "sweep"
+    # vecinos_cercanos: con "savings" solo se consideran los pares de las listas de k candidatos
+    #                   (un entero k, o las NeighborLists ya construidas para no repetir el cálculo)
+    if metodo not in _CONSTRUCTORES:
+        raise ValueError(f"Constructor desconocido: {metodo}")
+    if metodo in ("savings", "nearest_neighbor") and dist_matrix is None:
+        raise ValueError(f"El constructor {metodo} necesita la matriz de distancias")
+    if metodo == "sweep" and coords is None:
+        raise ValueError("El constructor sweep necesita las coordenadas")
+    vecinos = None
+    if dist_matrix is not None:
+        dist_matrix = _filas_distancia(dist_matrix)
+        if isinstance(vecinos_cercanos, NeighborLists):
+            vecinos = vecinos_cercanos
+        elif vecinos_cercanos and metodo == "savings":
+            vecinos = nearest_neighbors(dist_matrix, vecinos_cercanos)
+    return _CONSTRUCTORES[metodo](demands, capacity, dist_matrix, coords, depot, vecinos)
+
+def _construir_aleatoria(demands, capacity, dist_matrix, coords, depot, vecinos):
     # Clientes son del 1 al N, el depósito es 0
     clientes = list(range(1, len(demands)))
     random.shuffle(clientes) #Se elige un cliente de forma aleatoria
@@ -120,276 +594,881 @@ def generate_initial_solution(demands, capacity):
 
     return solucion_final
 
-# --- Operadores de Vecindario ---
-# Operador 1: Relocate (Mover un cliente de una ruta a otra o dentro de la misma ruta)
-def relocate(solucion, dist_matrix, demands, capacity):
-    mejor_solucion = [r[:] for r in solucion]
-    mejor_costo = calculate_cost(mejor_solucion, dist_matrix, demands, capacity)
-
-    for i in range(len(solucion)):
-      for j in range(1, len(solucion[i]) - 1):
-        cliente_a_mover = solucion[i][j]
-
-        for k in range(len(solucion)):
-          for l in range(1, len(solucion[k]) + 1):
-            if i==k and l == j:
-              continue
-
-            solucion_temp = [r[:] for r in solucion]
-            solucion_temp[i].pop(j) #elimina al cliente de su posicion original
-            if len(solucion_temp[i]) <= 1:
-              solucion_temp[i] = [0, 0]
-
-            solucion_temp[k].insert(l, cliente_a_mover)
-
-            ruta_i = sum(demands[node] for node in solucion_temp[i] if node != 0)
-            ruta_k = sum(demands[node] for node in solucion_temp[k] if node != 0)
-
-            if ruta_i <= capacity and ruta_k <= capacity:
-                        costo_actual = calculate_cost(solucion_temp, dist_matrix, demands, capacity)
-                        if costo_actual < mejor_costo:
-                            mejor_solucion = solucion_temp
-                            mejor_costo = costo_actual
+def _construir_ahorros(demands, capacity, dist_matrix, coords, depot, vecinos):
+    # Clarke-Wright en su versión paralela: se parte de una ruta por cliente y se unen extremos de rutas
+    # en orden decreciente de ahorro d(0,i) + d(0,j) - d(i,j), mientras el ahorro sea positivo y la carga quepa
+    n = len(demands)
+    fila_deposito = dist_matrix[0]
+    ahorros = []
+    for i in range(1, n):
+        fila = dist_matrix[i]
+        candidatos = vecinos.vecinos[i] if vecinos is not None else range(i + 1, n)
+        for j in candidatos:
+            if j == 0:
+                continue
+            ahorro = float(fila_deposito[i] + fila_deposito[j] - fila[j])
+            if ahorro > 0:
+                ahorros.append((-ahorro, min(i, j), max(i, j)))
+    heapq.heapify(ahorros)
+
+    rutas = {i: [i] for i in range(1, n)} # id de ruta -> clientes, sin los depósitos
+    cargas = {i: demands[i] for i in range(1, n)}
+    ruta_de = list(range(n))
+    while ahorros:
+        _, i, j = heapq.heappop(ahorros)
+        a, b = ruta_de[i], ruta_de[j]
+        if a == b or cargas[a] + cargas[b] > capacity:
+            continue
+        ruta_a, ruta_b = rutas[a], rutas[b]
+        # Solo se unen clientes que están en un extremo de su ruta (i al final de a, j al inicio de b)
+        if i not in (ruta_a[0], ruta_a[-1]) or j not in (ruta_b[0], ruta_b[-1]):
+            continue
+        if ruta_a[-1] != i:
+            ruta_a.reverse()
+        if ruta_b[0] != j:
+            ruta_b.reverse()
+        ruta_a.extend(ruta_b)
+        cargas[a] += cargas.pop(b)
+        for node in rutas.pop(b):
+            ruta_de[node] = a
+
+    return [[0] + ruta + [0] for ruta in rutas.values()]
+
+def _construir_barrido(demands, capacity, dist_matrix, coords, depot, vecinos):
+    # Ordena los clientes por ángulo polar alrededor del depósito y los empaqueta en ese orden,
+    # abriendo una ruta nueva cada vez que el siguiente cliente no cabe
+    x_0, y_0 = coords[depot]
+    clientes = sorted(range(1, len(demands)),
+                      key=lambda c: (math.atan2(coords[c][1] - y_0, coords[c][0] - x_0), c))
+    rutas = []
+    ruta_actual = [0]
+    carga_actual = 0
+    for cliente in clientes:
+        if len(ruta_actual) > 1 and carga_actual + demands[cliente] > capacity:
+            rutas.append(ruta_actual + [0])
+            ruta_actual = [0]
+            carga_actual = 0
+        ruta_actual.append(cliente)
+        carga_actual += demands[cliente]
+    if len(ruta_actual) > 1:
+        rutas.append(ruta_actual + [0])
+    return rutas
+
+def _construir_vecino_cercano(demands, capacity, dist_matrix, coords, depot, vecinos):
+    # Cada ruta sale del depósito y avanza al cliente pendiente más cercano que aún cabe
+    pendientes = set(range(1, len(demands)))
+    rutas = []
+    while pendientes:
+        ruta = [0]
+        carga = 0
+        while pendientes:
+            fila = dist_matrix[ruta[-1]]
+            factibles = [c for c in pendientes if carga + demands[c] <= capacity]
+            if not factibles:
+                if len(ruta) > 1:
+                    break
+                factibles = list(pendientes) # cliente que no cabe en ningún vehículo: ruta propia
+            siguiente = min(factibles, key=lambda c: (fila[c], c))
+            ruta.append(siguiente)
+            carga += demands[siguiente]
+            pendientes.discard(siguiente)
+            if carga > capacity:
+                break
+        ruta.append(0)
+        rutas.append(ruta)
+    return rutas
+
+_CONSTRUCTORES = {
+    "random": _construir_aleatoria,
+    "savings": _construir_ahorros,
+    "sweep": _construir_barrido,
+    "nearest_neighbor": _construir_vecino_cercano,
+}
+
+# === Evaluación incremental de movimientos ===
+# Los operadores puntúan cada candidato con el delta de las pocas aristas que cambian
+# y con las cargas/costos cacheados por ruta. Solo los candidatos cuyo delta compite con
+# el mejor encontrado se confirman con el costo exacto (misma suma que calculate_cost),
+# de modo que la elección del mejor vecino es idéntica a la evaluación completa.
+_TOLERANCIA_DELTA = 1e-7
+
+def _costo_ruta(ruta, dist_matrix, demands, capacidad):
+    # Devuelve (costo, penalización, carga) de una ruta, sumados igual que en calculate_cost
+    if not ruta or ruta[0] != 0 or ruta[-1] != 0:
+        return 0, 1000000, sum(demands[node] for node in ruta if node != 0)
+    if len(ruta) == 2:
+        return 0, 0, 0
+
+    demanda_ruta = 0
+    costo_ruta = 0
+    for i in range(len(ruta) - 1):
+        costo_ruta += dist_matrix[ruta[i]][ruta[i+1]]
+        if ruta[i] != 0:
+            demanda_ruta += demands[ruta[i]]
 
-    return mejor_solucion
+    penalización = 0
+    if demanda_ruta > capacidad:
+        penalización = (demanda_ruta - capacidad) * 1000
+    return costo_ruta, penalización, demanda_ruta
 
-# Operador 2: Swap (Intercambiar dos clientes entre dos rutas diferentes o dentro de la misma ruta)
-def swap(solucion, dist_matrix, demands, capacidad):
-    mejor_solucion = [r[:] for r in solucion]
-    mejor_costo = calculate_cost(mejor_solucion, dist_matrix, demands, capacidad)
+def _sumar_costos(costos, penalizaciones):
+    # Acumula ruta por ruta en el mismo orden que calculate_cost para obtener el mismo valor
+    costo_total = 0
+    penalización = 0
+    for idx in range(len(costos)):
+        costo_total += costos[idx]
+        penalización += penalizaciones[idx]
+    return costo_total + penalización
 
-    for r1_idx, ruta_1 in enumerate(solucion):
-        for i in range(1, len(ruta_1) - 1):
-            cliente_1 = ruta_1[i]
+# === Estado de una solución ===
+# Mantiene, junto a las rutas, la carga, el costo y la penalización de cada ruta, el costo
+# total y el índice nodo -> (ruta, posición). Se actualiza solo en las rutas que cambia un movimiento.
+class Solution:
+    __slots__ = ("rutas", "costos", "penalizaciones", "cargas", "costo_total",
+                 "ruta_de", "posicion_de", "dist_matrix", "demands", "capacidad")
+
+    def __init__(self, rutas, dist_matrix, demands, capacidad):
+        self.dist_matrix = dist_matrix
+        self.demands = demands
+        self.capacidad = capacidad
+        self.rutas = [ruta[:] for ruta in rutas]
+        self.costos = []
+        self.penalizaciones = []
+        self.cargas = []
+        for ruta in self.rutas:
+            costo, penalización, carga = _costo_ruta(ruta, dist_matrix, demands, capacidad)
+            self.costos.append(costo)
+            self.penalizaciones.append(penalización)
+            self.cargas.append(carga)
+        self.costo_total = _sumar_costos(self.costos, self.penalizaciones)
+        self.ruta_de = [-1] * len(demands)
+        self.posicion_de = [-1] * len(demands)
+        self._indexar(range(len(self.rutas)))
+
+    def _indexar(self, indices):
+        for r_idx in indices:
+            ruta = self.rutas[r_idx]
+            for pos in range(1, len(ruta) - 1):
+                self.ruta_de[ruta[pos]] = r_idx
+                self.posicion_de[ruta[pos]] = pos
+
+    def posicion(self, node):
+        # (ruta, posición) de un cliente, o None si no está en la solución
+        if self.ruta_de[node] < 0:
+            return None
+        return self.ruta_de[node], self.posicion_de[node]
+
+    def aplicar(self, cambios, costo_total=None):
+        # Reemplaza las rutas de `cambios` ({índice: ruta nueva}) y actualiza los caches
+        for r_idx, ruta in cambios.items():
+            for node in self.rutas[r_idx][1:-1]:
+                if self.ruta_de[node] == r_idx:
+                    self.ruta_de[node] = -1
+            self.rutas[r_idx] = ruta
+            costo, penalización, carga = _costo_ruta(ruta, self.dist_matrix, self.demands, self.capacidad)
+            self.costos[r_idx] = costo
+            self.penalizaciones[r_idx] = penalización
+            self.cargas[r_idx] = carga
+        self._indexar(cambios.keys())
+        if costo_total is None:
+            costo_total = _sumar_costos(self.costos, self.penalizaciones)
+        self.costo_total = costo_total
+
+    def eliminar_rutas_vacias(self):
+        # Quita las rutas [0, 0]; devuelve True si cambió algo
+        indices = [r_idx for r_idx, ruta in enumerate(self.rutas) if len(ruta) > 2]
+        if len(indices) == len(self.rutas):
+            return False
+        primera = next(r_idx for r_idx in range(len(self.rutas)) if len(self.rutas[r_idx]) <= 2)
+        self.rutas = [self.rutas[r_idx] for r_idx in indices]
+        self.costos = [self.costos[r_idx] for r_idx in indices]
+        self.penalizaciones = [self.penalizaciones[r_idx] for r_idx in indices]
+        self.cargas = [self.cargas[r_idx] for r_idx in indices]
+        self._indexar(range(primera, len(self.rutas)))
+        return True
+
+    def como_lista(self):
+        return [ruta[:] for ruta in self.rutas]
+
+    def copia(self):
+        nueva = Solution.__new__(Solution)
+        nueva.dist_matrix = self.dist_matrix
+        nueva.demands = self.demands
+        nueva.capacidad = self.capacidad
+        nueva.rutas = self.como_lista()
+        nueva.costos = self.costos[:]
+        nueva.penalizaciones = self.penalizaciones[:]
+        nueva.cargas = self.cargas[:]
+        nueva.costo_total = self.costo_total
+        nueva.ruta_de = self.ruta_de[:]
+        nueva.posicion_de = self.posicion_de[:]
+        return nueva
+
+def _como_estado(solucion, dist_matrix, demands, capacidad):
+    if isinstance(solucion, Solution):
+        return solucion
+    return Solution(solucion, dist_matrix, demands, capacidad)
+
+def _costo_con_cambios(estado, cambios, dist_matrix, demands, capacidad):
+    # Costo exacto de la solución tras reemplazar las rutas de `cambios` ({índice: ruta nueva})
+    nuevos = {idx: _costo_ruta(ruta, dist_matrix, demands, capacidad) for idx, ruta in cambios.items()}
 
-            for r2_idx, ruta_2 in enumerate(solucion):
-                for j in range(1, len(ruta_2) - 1):
-                    cliente_2 = ruta_2[j]
+    costo_total = 0
+    penalización = 0
+    for idx in range(len(estado.costos)):
+        if idx in nuevos:
+            costo_total += nuevos[idx][0]
+            penalización += nuevos[idx][1]
+        else:
+            costo_total += estado.costos[idx]
+            penalización += estado.penalizaciones[idx]
+    return costo_total + penalización
 
-                    if r1_idx == r2_idx and i >= j:
-                        continue
+def _aplicar_cambios(solucion, cambios):
+    # Copia la solución (una sola vez por operador) aplicando el mejor movimiento, si lo hay
+    cambios = cambios or {}
+    return [cambios.get(idx, ruta)[:] for idx, ruta in enumerate(solucion)]
+
+# --- Vecindarios granulares ---
+# Para cada nodo se precalculan sus k vecinos más cercanos. Con ellos, los operadores solo
+# recorren los movimientos que crean al menos una arista hacia un vecino candidato.
+class NeighborLists:
+    __slots__ = ("k", "vecinos", "conjuntos")
+
+    def __init__(self, vecinos, k):
+        self.k = k
+        self.vecinos = vecinos
+        self.conjuntos = [set(lista) for lista in vecinos]
+
+def nearest_neighbors(dist_matrix, k):
+    # k vecinos más cercanos de cada nodo (incluido el depósito), ordenados por distancia
+    n = len(dist_matrix)
+    vecinos = []
+    for i in range(n):
+        fila = dist_matrix.fila(i) if isinstance(dist_matrix, LazyDistances) else dist_matrix[i]
+        if _es_matriz_numpy(fila) and k + 1 < n:
+            # Se incluyen los empates en el borde para desempatar por índice como en la versión pura
+            limite = fila[np.argpartition(fila, k + 1)[:k + 1]].max()
+            candidatos = np.flatnonzero(fila <= limite)
+            candidatos = candidatos[np.lexsort((candidatos, fila[candidatos]))]
+            vecinos.append([int(j) for j in candidatos if j != i][:k])
+        else:
+            candidatos = heapq.nsmallest(k + 1, range(n), key=lambda j: (fila[j], j))
+            vecinos.append([j for j in candidatos if j != i][:k])
+    return NeighborLists(vecinos, k)
+
+def _posiciones_en_ruta(estado, node, r_idx):
+    # Posiciones de un nodo dentro de la ruta r_idx (el depósito está en ambos extremos)
+    if node == 0:
+        return (0, len(estado.rutas[r_idx]) - 1)
+    if estado.ruta_de[node] == r_idx:
+        return (estado.posicion_de[node],)
+    return ()
 
-                    solucion_temp = [r[:] for r in solucion]
+# --- Operadores de Vecindario ---
+# Cada operador tiene una búsqueda `_buscar_*` que devuelve (mejor_costo, cambios, evaluados),
+# con cambios=None si ningún movimiento mejora la solución actual. Con `vecinos` (NeighborLists)
+# la búsqueda se restringe al vecindario granular, y con `rutas_origen` a los movimientos cuya
+# ruta de origen (la primera del par en interchange) está en ese subconjunto. Con primera_mejora=True
+# devuelve el primer movimiento que mejora en lugar del mejor del vecindario.
+def _indices_origen(estado, rutas_origen):
+    return range(len(estado.rutas)) if rutas_origen is None else rutas_origen
 
-                    # Swap en la misma ruta
-                    if r1_idx == r2_idx:
-                        solucion_temp[r1_idx][i], solucion_temp [r1_idx][j] = solucion_temp[r1_idx][j], solucion_temp[r1_idx][i]
-                    else: # Swap entre rutas diferentes
-                        solucion_temp[r1_idx][i] = cliente_1
-                        solucion_temp[r2_idx][j] = cliente_2
+# Operador 1: Relocate (Mover un cliente de una ruta a otra o dentro de la misma ruta)
+def _destinos_relocate(estado, i, j, cliente, vecinos):
+    # Rutas destino y posiciones de inserción; si el destino es la misma ruta, las posiciones
+    # se cuentan sobre la ruta sin el cliente. Las inserciones tras el depósito final dejan la
+    # ruta mal formada (penalización 1e6) y nunca mejoran una solución reparada.
+    solucion = estado.rutas
+    if vecinos is None:
+        for k in range(len(solucion)):
+            yield k, range(1, len(solucion[k]) - (1 if k == i else 0))
+        return
+
+    for v in vecinos.vecinos[cliente]:
+        if v == 0:
+            # Junto al depósito: primera o última posición de cualquier ruta
+            for k in range(len(solucion)):
+                largo = len(solucion[k]) - (1 if k == i else 0)
+                yield k, (1, largo - 1) if largo > 2 else (1,)
+            continue
+        k = estado.ruta_de[v]
+        if k < 0:
+            continue
+        pos = estado.posicion_de[v]
+        if k == i and pos > j:
+            pos -= 1
+        # Antes o después del vecino
+        yield k, (pos, pos + 1)
+
+def _buscar_relocate(estado, dist_matrix, demands, capacidad, vecinos=None, rutas_origen=None,
+                     primera_mejora=False):
+    solucion = estado.rutas
+    penalizaciones, cargas = estado.penalizaciones, estado.cargas
+    mejor_costo = estado.costo_total
+    mejor_delta = 0
+    mejor_cambios = None
+    evaluados = 0
+
+    for i in _indices_origen(estado, rutas_origen):
+      ruta_i = solucion[i]
+      for j in range(1, len(ruta_i) - 1):
+        cliente_a_mover = ruta_i[j]
+        demanda_cliente = demands[cliente_a_mover]
+        a, b = ruta_i[j-1], ruta_i[j+1]
+        delta_quitar = dist_matrix[a][b] - dist_matrix[a][cliente_a_mover] - dist_matrix[cliente_a_mover][b]
+        fila_cliente = dist_matrix[cliente_a_mover]
+        ruta_sin_cliente = None
+
+        for k, posiciones in _destinos_relocate(estado, i, j, cliente_a_mover, vecinos):
+          ruta_k = solucion[k]
+          if i == k:
+            # Misma ruta: la carga no cambia
+            if cargas[i] > capacidad:
+              continue
+            if ruta_sin_cliente is None:
+              ruta_sin_cliente = ruta_i[:j] + ruta_i[j+1:]
+            ruta_sin = ruta_sin_cliente
+            delta_penalización = 0
+          else:
+            if cargas[i] - demanda_cliente > capacidad or cargas[k] + demanda_cliente > capacidad:
+              continue
+            ruta_sin = ruta_k
+            delta_penalización = -penalizaciones[i] - penalizaciones[k]
 
-                    # Verificar validez de capacidad para las rutas modificadas
-                    valid_swap = True
-                    if r1_idx == r2_idx:
-                        demandaRuta = sum(demands[node] for node in solucion_temp[r1_idx] if node != 0)
-                        if demandaRuta > capacidad:
-                            valid_swap = False
-                    else:
-                        demand_1 = sum(demands[node] for node in solucion_temp[r1_idx] if node != 0)
-                        demand_2 = sum(demands[node] for node in solucion_temp[r2_idx] if node != 0)
-                        if demand_1 > capacidad or demand_2 > capacidad:
-                            valid_swap = False
+          for l in posiciones:
+            if i == k and l == j:
+              continue
+            p, q = ruta_sin[l-1], ruta_sin[l]
+            delta = delta_quitar + dist_matrix[p][cliente_a_mover] + fila_cliente[q] - dist_matrix[p][q] + delta_penalización
+            evaluados += 1
 
-                    if valid_swap:
-                        costoActual = calculate_cost(solucion_temp, dist_matrix, demands, capacidad)
-                        if costoActual < mejor_costo:
-                            mejor_solucion = solucion_temp
-                            mejor_costo = costoActual
+            if delta < mejor_delta + _TOLERANCIA_DELTA:
+                if i == k:
+                    cambios = {i: ruta_sin[:l] + [cliente_a_mover] + ruta_sin[l:]}
+                else:
+                    cambios = {i: ruta_i[:j] + ruta_i[j+1:], k: ruta_k[:l] + [cliente_a_mover] + ruta_k[l:]}
+                costo_actual = _costo_con_cambios(estado, cambios, dist_matrix, demands, capacidad)
+                if costo_actual < mejor_costo:
+                    mejor_cambios = cambios
+                    mejor_costo = costo_actual
+                    mejor_delta = delta
+                    if primera_mejora:
+                        return mejor_costo, mejor_cambios, evaluados
+
+    return mejor_costo, mejor_cambios, evaluados
+
+def relocate(solucion, dist_matrix, demands, capacity, vecinos=None):
+    dist_matrix = _filas_distancia(dist_matrix)
+    estado = _como_estado(solucion, dist_matrix, demands, capacity)
+    _, cambios, _ = _buscar_relocate(estado, dist_matrix, demands, capacity, vecinos)
+    return _aplicar_cambios(estado.rutas, cambios)
+
+# Operador 2: Swap (Intercambiar dos clientes dentro de la misma ruta)
+# Nota: la rama entre rutas diferentes del operador original reasignaba cada cliente a su
+# propia posición (no cambiaba la solución), así que solo los intercambios intra-ruta pueden mejorar.
+def _pares_swap(estado, r_idx, vecinos):
+    ruta = estado.rutas[r_idx]
+    if vecinos is None:
+        return ((i, j) for i in range(1, len(ruta) - 1) for j in range(i + 1, len(ruta) - 1))
+
+    # El cliente en i pasa a quedar justo antes o después de uno de sus vecinos
+    pares = set()
+    for i in range(1, len(ruta) - 1):
+        for v in vecinos.vecinos[ruta[i]]:
+            for pos in _posiciones_en_ruta(estado, v, r_idx):
+                for t in (pos - 1, pos + 1):
+                    if 1 <= t <= len(ruta) - 2 and t != i:
+                        pares.add((min(i, t), max(i, t)))
+    return sorted(pares)
+
+def _buscar_swap(estado, dist_matrix, demands, capacidad, vecinos=None, rutas_origen=None,
+                 primera_mejora=False):
+    solucion = estado.rutas
+    cargas = estado.cargas
+    mejor_costo = estado.costo_total
+    mejor_delta = 0
+    mejor_cambios = None
+    evaluados = 0
+
+    for r_idx in _indices_origen(estado, rutas_origen):
+        ruta = solucion[r_idx]
+        if cargas[r_idx] > capacidad:
+            continue
+        for i, j in _pares_swap(estado, r_idx, vecinos):
+            a, cliente_1, p = ruta[i-1], ruta[i], ruta[i+1]
+            q, cliente_2, b = ruta[j-1], ruta[j], ruta[j+1]
 
-    return mejor_solucion
+            if j == i + 1:
+                delta = (dist_matrix[a][cliente_2] + dist_matrix[cliente_2][cliente_1] + dist_matrix[cliente_1][b]
+                         - dist_matrix[a][cliente_1] - dist_matrix[cliente_1][cliente_2] - dist_matrix[cliente_2][b])
+            else:
+                delta = (dist_matrix[a][cliente_2] + dist_matrix[cliente_2][p] + dist_matrix[q][cliente_1] + dist_matrix[cliente_1][b]
+                         - dist_matrix[a][cliente_1] - dist_matrix[cliente_1][p] - dist_matrix[q][cliente_2] - dist_matrix[cliente_2][b])
+            evaluados += 1
+
+            if delta < mejor_delta + _TOLERANCIA_DELTA:
+                nueva_ruta = ruta[:]
+                nueva_ruta[i], nueva_ruta[j] = cliente_2, cliente_1
+                cambios = {r_idx: nueva_ruta}
+                costoActual = _costo_con_cambios(estado, cambios, dist_matrix, demands, capacidad)
+                if costoActual < mejor_costo:
+                    mejor_cambios = cambios
+                    mejor_costo = costoActual
+                    mejor_delta = delta
+                    if primera_mejora:
+                        return mejor_costo, mejor_cambios, evaluados
+
+    return mejor_costo, mejor_cambios, evaluados
+
+def swap(solucion, dist_matrix, demands, capacidad, vecinos=None):
+    dist_matrix = _filas_distancia(dist_matrix)
+    estado = _como_estado(solucion, dist_matrix, demands, capacidad)
+    _, cambios, _ = _buscar_swap(estado, dist_matrix, demands, capacidad, vecinos)
+    return _aplicar_cambios(estado.rutas, cambios)
 
 # Operador 3: 2-Opt (Invertir un segmento de ruta para eliminar cruces)
-def two_opt(solucion, dist_matrix, demands, capacidad):
-    mejor_solucion = [r[:] for r in solucion]
-    mejor_costo = calculate_cost(mejor_solucion, dist_matrix, demands, capacidad)
-
-    for r_idx, ruta in enumerate(solucion):
+# Con distancias simétricas, invertir ruta[i..j] solo cambia las aristas (i-1, i) y (j, j+1).
+def _cortes_two_opt(estado, r_idx, vecinos):
+    ruta = estado.rutas[r_idx]
+    ultimo = len(ruta) - 1
+    if vecinos is None:
+        return ((i, j) for i in range(1, ultimo - 1) for j in range(i + 1, ultimo))
+
+    # Cortes que crean la arista (ruta[i-1], ruta[j]) o (ruta[i], ruta[j+1]) hacia un vecino
+    cortes = set()
+    for p in range(ultimo + 1):
+        for v in vecinos.vecinos[ruta[p]]:
+            for q in _posiciones_en_ruta(estado, v, r_idx):
+                x, y = min(p, q), max(p, q)
+                if 1 <= x + 1 < y < ultimo:
+                    cortes.add((x + 1, y))
+                if 1 <= x < y - 1 < ultimo:
+                    cortes.add((x, y - 1))
+    return sorted(cortes)
+
+def _deltas_two_opt(ruta, cortes, dist_matrix):
+    for i, j in cortes:
+        a, c = ruta[i-1], ruta[i]
+        d, b = ruta[j], ruta[j+1]
+        yield i, j, dist_matrix[a][d] + dist_matrix[c][b] - dist_matrix[a][c] - dist_matrix[d][b]
+
+def _deltas_two_opt_lotes(ruta, dist_matrix, umbral):
+    # Todas las inversiones de la ruta a la vez; devuelve solo las que compiten con `umbral`,
+    # en el mismo orden (i, j) que el recorrido secuencial
+    r = np.asarray(ruta, dtype=np.intp)
+    ultimo = len(r) - 1
+    ii = np.arange(1, ultimo - 1)[:, None]
+    jj = np.arange(2, ultimo)[None, :]
+    a, c = r[ii - 1], r[ii]
+    d, b = r[jj], r[jj + 1]
+    deltas = dist_matrix[a, d] + dist_matrix[c, b] - dist_matrix[a, c] - dist_matrix[d, b]
+    filas, columnas = np.nonzero((jj > ii) & (deltas < umbral))
+    return [(int(ii[f, 0]), int(jj[0, col]), deltas[f, col]) for f, col in zip(filas, columnas)]
+
+def _buscar_two_opt(estado, dist_matrix, demands, capacidad, vecinos=None, rutas_origen=None,
+                    primera_mejora=False):
+    solucion = estado.rutas
+    mejor_costo = estado.costo_total
+    mejor_delta = 0
+    mejor_cambios = None
+    evaluados = 0
+    # Con una matriz NumPy y el vecindario completo, cada ruta se puntúa en un solo lote
+    por_lotes = vecinos is None and _es_matriz_numpy(dist_matrix)
+
+    for r_idx in _indices_origen(estado, rutas_origen):
+        ruta = solucion[r_idx]
         if len(ruta) < 4:
             continue
 
-        for i in range(1, len(ruta) - 2): # Primer punto de corte
-            for j in range(i + 1, len(ruta) - 1): # Segundo punto de corte
+        if por_lotes:
+            movimientos = _deltas_two_opt_lotes(ruta, dist_matrix, mejor_delta + _TOLERANCIA_DELTA)
+            evaluados += (len(ruta) - 3) * (len(ruta) - 2) // 2
+        else:
+            movimientos = _deltas_two_opt(ruta, _cortes_two_opt(estado, r_idx, vecinos), dist_matrix)
+
+        for i, j, delta in movimientos: # Puntos de corte
+            if not por_lotes:
+                evaluados += 1
 
-                # Crear la nueva ruta 2-opt
+            if delta < mejor_delta + _TOLERANCIA_DELTA:
                 # Segmento 1: desde el inicio hasta i-1
                 # Segmento 2: desde j hasta i (invertido)
                 # Segmento 3: desde j+1 hasta el final
-                nuevaRuta = ruta[:i] + ruta[j:i-1:-1] + ruta[j+1:]
-
-                solucion_temp = [r[:] for r in solucion]
-                solucion_temp[r_idx] = nuevaRuta
-
-                # Para 2-opt, la capacidad de la ruta no cambia, solo el orden, así que no se revisa explícitamente
-                costo_actual = calculate_cost(solucion_temp, dist_matrix, demands, capacidad)
+                cambios = {r_idx: ruta[:i] + ruta[j:i-1:-1] + ruta[j+1:]}
+                costo_actual = _costo_con_cambios(estado, cambios, dist_matrix, demands, capacidad)
                 if costo_actual < mejor_costo:
-                  mejor_solucion = solucion_temp
-                  mejor_costo = costo_actual
+                    mejor_cambios = cambios
+                    mejor_costo = costo_actual
+                    mejor_delta = delta
+                    if primera_mejora:
+                        return mejor_costo, mejor_cambios, evaluados
+
+    return mejor_costo, mejor_cambios, evaluados
 
-    return mejor_solucion
+def two_opt(solucion, dist_matrix, demands, capacidad, vecinos=None):
+    dist_matrix = _filas_distancia(dist_matrix)
+    estado = _como_estado(solucion, dist_matrix, demands, capacidad)
+    _, cambios, _ = _buscar_two_opt(estado, dist_matrix, demands, capacidad, vecinos)
+    return _aplicar_cambios(estado.rutas, cambios)
 
 # Operador 4: Interchange (Intercambiar dos segmentos de ruta entre dos rutas diferentes)
-def interchange(solucion, dist_matrix, demands, capacidad):
-    mejor_solucion = [r[:] for r in solucion]
-    mejor_costo = calculate_cost(mejor_solucion, dist_matrix, demands, capacidad)
+# Cada ruta se corta en su propio punto (i en la primera, j en la segunda) y se intercambian las
+# colas: es el 2-opt* clásico. two_opt_star (operador 6) cubre la variante que une las rutas invirtiéndolas.
+def _pares_rutas(estado, vecinos, rutas_origen=None):
+    n_rutas = len(estado.rutas)
+    if vecinos is None:
+        return ((r1, r2) for r1 in _indices_origen(estado, rutas_origen) for r2 in range(r1 + 1, n_rutas))
+
+    # Solo pares de rutas que contienen vecinos candidatos entre sí
+    pares = set()
+    for r1, ruta in enumerate(estado.rutas):
+        for node in ruta[1:-1]:
+            for v in vecinos.vecinos[node]:
+                r2 = estado.ruta_de[v] if v != 0 else -1
+                if r2 >= 0 and r2 != r1:
+                    pares.add((min(r1, r2), max(r1, r2)))
+    if rutas_origen is not None:
+        origen = set(rutas_origen)
+        pares = {par for par in pares if par[0] in origen}
+    return sorted(pares)
+
+def _prefijos_carga(solucion, demands):
+    # Carga acumulada de cada ruta: prefijos[r][i] = demanda de los primeros i clientes
+    prefijos = []
+    for ruta in solucion:
+        acumulado = [0]
+        for node in ruta[1:-1]:
+            acumulado.append(acumulado[-1] + demands[node])
+        prefijos.append(acumulado)
+    return prefijos
+
+def _cortes_entre_rutas(estado, r1_idx, r2_idx, vecinos, invertido):
+    # Puntos de corte (i, j): ruta_1 se corta tras la posición i y ruta_2 tras la posición j.
+    # Sin invertir se crean las aristas (ruta_1[i], ruta_2[j+1]) y (ruta_2[j], ruta_1[i+1]);
+    # invirtiendo, (ruta_1[i], ruta_2[j]) y (ruta_1[i+1], ruta_2[j+1]). Los cortes que dejan las
+    # mismas rutas (o las mismas intercambiadas) se omiten.
+    ruta_1, ruta_2 = estado.rutas[r1_idx], estado.rutas[r2_idx]
+    n_1, n_2 = len(ruta_1) - 2, len(ruta_2) - 2
+    triviales = ((0, n_2), (n_1, 0)) if invertido else ((0, 0), (n_1, n_2))
+    if vecinos is None:
+        return ((i, j) for i in range(n_1 + 1) for j in range(n_2 + 1) if (i, j) not in triviales)
+
+    # Cortes que crean una arista entre un nodo de una ruta y uno de sus vecinos en la otra
+    cortes = set()
+    def agregar(p, q):
+        for i, j in ((p, q), (p - 1, q - 1)) if invertido else ((p, q - 1), (p - 1, q)):
+            if 0 <= i <= n_1 and 0 <= j <= n_2:
+                cortes.add((i, j))
+    for p, node in enumerate(ruta_1):
+        for v in vecinos.vecinos[node]:
+            for q in _posiciones_en_ruta(estado, v, r2_idx):
+                agregar(p, q)
+    for q, node in enumerate(ruta_2):
+        for v in vecinos.vecinos[node]:
+            for p in _posiciones_en_ruta(estado, v, r1_idx):
+                agregar(p, q)
+    return sorted(cortes.difference(triviales))
+
+def _buscar_cortes_entre_rutas(estado, dist_matrix, demands, capacidad, vecinos, rutas_origen,
+                               primera_mejora, invertido):
+    solucion = estado.rutas
+    penalizaciones = estado.penalizaciones
+    mejor_costo = estado.costo_total
+    mejor_delta = 0
+    mejor_cambios = None
+    evaluados = 0
+    prefijos = _prefijos_carga(solucion, demands)
 
     # Iterar sobre pares de rutas
-    for r1_idx in range(len(solucion)):
-        for r2_idx in range(r1_idx + 1, len(solucion)):
-            ruta_1 = solucion[r1_idx]
-            ruta_2 = solucion[r2_idx]
+    for r1_idx, r2_idx in _pares_rutas(estado, vecinos, rutas_origen):
+        ruta_1 = solucion[r1_idx]
+        ruta_2 = solucion[r2_idx]
+        n_1 = len(ruta_1) - 2
+        n_2 = len(ruta_2) - 2
 
-            nodo_1 = ruta_1[1:-1]
-            nodo_2 = ruta_2[1:-1]
+        if n_1 <= 0 or n_2 <= 0:
+            continue
 
-            if not nodo_1 or not nodo_2:
+        pre_1, pre_2 = prefijos[r1_idx], prefijos[r2_idx]
+        delta_penalización = -penalizaciones[r1_idx] - penalizaciones[r2_idx]
+
+        for i, j in _cortes_entre_rutas(estado, r1_idx, r2_idx, vecinos, invertido):
+            # Dividir las rutas: cabezas A1 = ruta_1[..i], A2 = ruta_2[..j] y colas B1, B2
+            a1, b1 = ruta_1[i], ruta_1[i+1]
+            a2, b2 = ruta_2[j], ruta_2[j+1]
+            if invertido:
+                # (A1, A2 invertida) y (B1 invertida, B2)
+                demand_r1 = pre_1[i] + pre_2[j]
+                demand_r2 = pre_1[n_1] - pre_1[i] + pre_2[n_2] - pre_2[j]
+            else:
+                # (A1, B2) y (A2, B1)
+                demand_r1 = pre_1[i] + pre_2[n_2] - pre_2[j]
+                demand_r2 = pre_2[j] + pre_1[n_1] - pre_1[i]
+            if demand_r1 > capacidad or demand_r2 > capacidad:
                 continue
 
-            # Iterar sobre todos los posibles puntos de corte en ambas rutas
-            for i in range(len(nodo_1) + 1):
-                for j in range(len(nodo_2) + 1):
-
-                    # Dividir las rutas en segmentos basados en los puntos de corte
-                    segUno_mitadUno = nodo_1[:i]
-                    segUno_mitadDos = nodo_1[i:]
-
-                    segDos_mitadUno = nodo_2[:i]
-                    segDos_mitadDos = nodo_2[i:]
-
-                    # Probar el intercambio de las segundas partes: (A1, B2) y (A2, B1)
-                    nuevaRuta_uno = segUno_mitadUno + segDos_mitadDos
-                    nuevaRuta_dos = segDos_mitadUno + segUno_mitadDos
-
-                    temp_rutaUno = [0] + nuevaRuta_uno + [0]
-                    temp_rutaDos = [0] + nuevaRuta_dos + [0]
-
-                    # Verificar validez de capacidad para las nuevas rutas
-                    demand_r1 = sum(demands[node] for node in temp_rutaUno if node != 0)
-                    demand_r2 = sum(demands[node] for node in temp_rutaDos if node != 0)
-
-                    if demand_r1 <= capacidad and demand_r2 <= capacidad:
-                        solucion_temp = [r[:] for r in solucion]
-                        solucion_temp[r1_idx] = temp_rutaUno
-                        solucion_temp[r2_idx] = temp_rutaDos
-
-                        costo_actual = calculate_cost(solucion_temp, dist_matrix, demands, capacidad)
-                        if costo_actual < mejor_costo:
-                          mejor_solucion = solucion_temp
-                          mejor_costo = costo_actual
-
-    return mejor_solucion
-def fix_solution(solucion, num_clientes, demands, capacidad):
-    # Paso 1: Limpiar y normalizar las rutas (asegurar [0, ..., 0] y eliminar rutas vacías)
-    expected_customers = set(range(1, num_clientes + 1))
-    cleaned_solution = []
-    all_nodes_present = [] # Para rastrear todos los clientes encontrados
-
-    for ruta in solucion:
-        # Asegurarse que la ruta comienza y termina en 0
-        if not ruta or ruta[0] != 0:
-            ruta.insert(0, 0)
-        if not ruta or ruta[-1] != 0:
-            ruta.append(0)
-
-        # Eliminar depósitos consecutivos (ej. [0,0,cliente,0] a [0,cliente,0])
-        temp_cleaned_route = []
-        for i in range(len(ruta)):
-            if i > 0 and ruta[i] == 0 and temp_cleaned_route[-1] == 0:
+            if invertido:
+                delta = dist_matrix[a1][a2] + dist_matrix[b1][b2]
+            else:
+                delta = dist_matrix[a1][b2] + dist_matrix[a2][b1]
+            delta += delta_penalización - dist_matrix[a1][b1] - dist_matrix[a2][b2]
+            evaluados += 1
+
+            if delta < mejor_delta + _TOLERANCIA_DELTA:
+                if invertido:
+                    cambios = {
+                        r1_idx: ruta_1[:i+1] + ruta_2[j::-1],
+                        r2_idx: ruta_1[:i:-1] + ruta_2[j+1:],
+                    }
+                else:
+                    cambios = {
+                        r1_idx: ruta_1[:i+1] + ruta_2[j+1:],
+                        r2_idx: ruta_2[:j+1] + ruta_1[i+1:],
+                    }
+                costo_actual = _costo_con_cambios(estado, cambios, dist_matrix, demands, capacidad)
+                if costo_actual < mejor_costo:
+                    mejor_cambios = cambios
+                    mejor_costo = costo_actual
+                    mejor_delta = delta
+                    if primera_mejora:
+                        return mejor_costo, mejor_cambios, evaluados
+
+    return mejor_costo, mejor_cambios, evaluados
+
+def _buscar_interchange(estado, dist_matrix, demands, capacidad, vecinos=None, rutas_origen=None,
+                        primera_mejora=False):
+    return _buscar_cortes_entre_rutas(estado, dist_matrix, demands, capacidad, vecinos, rutas_origen,
+                                      primera_mejora, invertido=False)
+
+def interchange(solucion, dist_matrix, demands, capacidad, vecinos=None):
+    dist_matrix = _filas_distancia(dist_matrix)
+    estado = _como_estado(solucion, dist_matrix, demands, capacidad)
+    _, cambios, _ = _buscar_interchange(estado, dist_matrix, demands, capacidad, vecinos)
+    return _aplicar_cambios(estado.rutas, cambios)
+
+# Operador 5: Or-opt (Mover un segmento de 1 a 3 clientes consecutivos a otra posición, en su sentido
+# o invertido, dentro de la misma ruta o hacia otra). La demanda del segmento sale de las cargas acumuladas.
+_LARGOS_OR_OPT = (1, 2, 3)
+
+def _destinos_or_opt(estado, r_idx, i, largo, vecinos):
+    # Como _destinos_relocate, para el segmento ruta[i:i+largo] (posiciones de la misma ruta contadas
+    # sobre la ruta sin el segmento); con vecinos, junto a un vecino de cualquiera de sus extremos
+    solucion = estado.rutas
+    if vecinos is None:
+        for k in range(len(solucion)):
+            yield k, range(1, len(solucion[k]) - (largo if k == r_idx else 0))
+        return
+
+    ruta = solucion[r_idx]
+    extremos = (ruta[i], ruta[i + largo - 1]) if largo > 1 else (ruta[i],)
+    for extremo in extremos:
+        for v in vecinos.vecinos[extremo]:
+            if v == 0:
+                # Junto al depósito: primera o última posición de cualquier ruta
+                for k in range(len(solucion)):
+                    ultima = len(solucion[k]) - (largo if k == r_idx else 0) - 1
+                    yield k, (1, ultima) if ultima > 1 else (1,)
                 continue
-            temp_cleaned_route.append(ruta[i])
-
-        # Si la ruta tiene clientes (más de 2 nodos [0,0]), la añadimos
-        if len(temp_cleaned_route) > 2:
-            cleaned_solution.append(temp_cleaned_route)
-            for node in temp_cleaned_route:
-                if node != 0:
-                    all_nodes_present.append(node)
-        elif len(temp_cleaned_route) == 2 and temp_cleaned_route[0] == 0 and temp_cleaned_route[1] == 0:
-            pass
-
-    # Paso 2: Identificar clientes duplicados y faltantes
-    expected_customers = set(range(1, num_clientes + 1))
-    node_counts = Counter(all_nodes_present)
-
-    current_found_customers_set = set(node_counts.keys())
-
-    customers_to_remove_duplicates_of = {node for node, count in node_counts.items() if count > 1}
-
-    # Crear la solución final eliminando los duplicados
-    solution_without_duplicates = []
-    for ruta in cleaned_solution:
-        ruta_temp = [0] # Siempre empieza con el depósito
-        visitados = set()
-
-        for node in ruta[1:-1]: # Iterar sobre los clientes de la ruta (excluyendo depósitos)
-            if node in customers_to_remove_duplicates_of and node in current_found_customers_set:
-                if node_counts[node] > 0:
-                    if node not in visitados:
-                        ruta_temp.append(node)
-                        visitados.add(node)
-                        node_counts[node] -= 1
+            k = estado.ruta_de[v]
+            if k < 0:
+                continue
+            pos = estado.posicion_de[v]
+            if k == r_idx:
+                if i <= pos < i + largo:
+                    continue
+                if pos > i:
+                    pos -= largo
+            # Antes o después del vecino
+            yield k, (pos, pos + 1)
+
+def _buscar_or_opt(estado, dist_matrix, demands, capacidad, vecinos=None, rutas_origen=None,
+                   primera_mejora=False):
+    solucion = estado.rutas
+    penalizaciones, cargas = estado.penalizaciones, estado.cargas
+    mejor_costo = estado.costo_total
+    mejor_delta = 0
+    mejor_cambios = None
+    evaluados = 0
+    prefijos = _prefijos_carga(solucion, demands)
+
+    for r_idx in _indices_origen(estado, rutas_origen):
+        ruta = solucion[r_idx]
+        pre = prefijos[r_idx]
+        for largo in _LARGOS_OR_OPT:
+            for i in range(1, len(ruta) - largo):
+                segmento = ruta[i:i+largo]
+                s_0, s_f = segmento[0], segmento[-1]
+                a, b = ruta[i-1], ruta[i+largo]
+                demanda_segmento = pre[i+largo-1] - pre[i-1]
+                delta_quitar = dist_matrix[a][b] - dist_matrix[a][s_0] - dist_matrix[s_f][b]
+                sentidos = (False, True) if largo > 1 else (False,)
+                ruta_sin_segmento = None
+
+                for k, posiciones in _destinos_or_opt(estado, r_idx, i, largo, vecinos):
+                    ruta_k = solucion[k]
+                    if k == r_idx:
+                        # Misma ruta: la carga no cambia
+                        if cargas[r_idx] > capacidad:
+                            continue
+                        if ruta_sin_segmento is None:
+                            ruta_sin_segmento = ruta[:i] + ruta[i+largo:]
+                        ruta_sin = ruta_sin_segmento
+                        delta_penalización = 0
                     else:
-                        pass
-                else:
-                    pass
-            else:
-                ruta_temp.append(node)
-                visitados.add(node)
-
-        ruta_temp.append(0) # Siempre termina con el depósito
-        if len(ruta_temp) > 2: # Solo añadir rutas que tienen clientes
-            solution_without_duplicates.append(ruta_temp)
-
-    # Recalcular los clientes faltantes después de la eliminación de duplicados
-    all_nodes_after_dup_fix = []
-    for ruta in solution_without_duplicates:
+                        if (cargas[r_idx] - demanda_segmento > capacidad
+                                or cargas[k] + demanda_segmento > capacidad):
+                            continue
+                        ruta_sin = ruta_k
+                        delta_penalización = -penalizaciones[r_idx] - penalizaciones[k]
+
+                    for l in posiciones:
+                        p, q = ruta_sin[l-1], ruta_sin[l]
+                        base = delta_quitar - dist_matrix[p][q] + delta_penalización
+                        for invertido in sentidos:
+                            if k == r_idx and l == i and not invertido:
+                                continue
+                            if invertido:
+                                delta = base + dist_matrix[p][s_f] + dist_matrix[s_0][q]
+                            else:
+                                delta = base + dist_matrix[p][s_0] + dist_matrix[s_f][q]
+                            evaluados += 1
+
+                            if delta < mejor_delta + _TOLERANCIA_DELTA:
+                                insertado = segmento[::-1] if invertido else segmento
+                                if k == r_idx:
+                                    cambios = {r_idx: ruta_sin[:l] + insertado + ruta_sin[l:]}
+                                else:
+                                    cambios = {r_idx: ruta[:i] + ruta[i+largo:],
+                                               k: ruta_k[:l] + insertado + ruta_k[l:]}
+                                costo_actual = _costo_con_cambios(estado, cambios, dist_matrix, demands, capacidad)
+                                if costo_actual < mejor_costo:
+                                    mejor_cambios = cambios
+                                    mejor_costo = costo_actual
+                                    mejor_delta = delta
+                                    if primera_mejora:
+                                        return mejor_costo, mejor_cambios, evaluados
+
+    return mejor_costo, mejor_cambios, evaluados
+
+def or_opt(solucion, dist_matrix, demands, capacidad, vecinos=None):
+    dist_matrix = _filas_distancia(dist_matrix)
+    estado = _como_estado(solucion, dist_matrix, demands, capacidad)
+    _, cambios, _ = _buscar_or_opt(estado, dist_matrix, demands, capacidad, vecinos)
+    return _aplicar_cambios(estado.rutas, cambios)
+
+# Operador 6: 2-Opt* invertido (Unir la cabeza de una ruta con la cabeza invertida de otra, y las colas
+# entre sí). Junto con interchange completa el vecindario 2-opt* entre rutas.
+def _buscar_two_opt_star(estado, dist_matrix, demands, capacidad, vecinos=None, rutas_origen=None,
+                         primera_mejora=False):
+    return _buscar_cortes_entre_rutas(estado, dist_matrix, demands, capacidad, vecinos, rutas_origen,
+                                      primera_mejora, invertido=True)
+
+def two_opt_star(solucion, dist_matrix, demands, capacidad, vecinos=None):
+    dist_matrix = _filas_distancia(dist_matrix)
+    estado = _como_estado(solucion, dist_matrix, demands, capacidad)
+    _, cambios, _ = _buscar_two_opt_star(estado, dist_matrix, demands, capacidad, vecinos)
+    return _aplicar_cambios(estado.rutas, cambios)
+
+# Búsquedas de vecindario por nombre, en el orden por defecto del VND
+_BUSQUEDAS = {
+    "relocate": _buscar_relocate,
+    "swap": _buscar_swap,
+    "two_opt": _buscar_two_opt,
+    "interchange": _buscar_interchange,
+    "or_opt": _buscar_or_opt,
+    "two_opt_star": _buscar_two_opt_star,
+}
+
+def fix_solution(solucion, num_clientes, demands, capacidad, dist_matrix=None):
+    # Reparación completa: una sola pasada sobre los nodos con cargas cacheadas. Se conserva la primera
+    # aparición de cada cliente y los faltantes se reinsertan con inserción más barata si hay matriz de
+    # distancias (o en la primera ruta con capacidad si no la hay)
+    if isinstance(solucion, Solution):
+        if dist_matrix is None:
+            dist_matrix = solucion.dist_matrix
+        solucion = solucion.rutas
+    if dist_matrix is not None:
+        dist_matrix = _filas_distancia(dist_matrix)
+
+    # Paso 1: Normalizar las rutas ([0, ..., 0], sin depósitos consecutivos), descartar duplicados y
+    # nodos fuera de rango, y eliminar las rutas que quedan vacías
+    visto = [False] * (num_clientes + 1)
+    rutas = []
+    cargas = []
+    for ruta in solucion:
+        nueva = [0]
+        carga = 0
         for node in ruta:
-            if node != 0:
-                all_nodes_after_dup_fix.append(node)
-
-    found_customers_after_fix_set = set(all_nodes_after_dup_fix)
-    missing_customers = list(expected_customers - found_customers_after_fix_set)
-
-    # Paso 3: Reinsertar clientes faltantes y verificar capacidad final
-    solucion_final = [r[:] for r in solution_without_duplicates]
-
-    for cliente in missing_customers:
-        inserted = False
-        for ruta_idx, ruta in enumerate(solucion_final):
-            current_load = sum(demands[node] for node in ruta if node != 0)
-            if current_load + demands[cliente] <= capacidad:
+            if node == 0:
+                if nueva[-1] != 0:
+                    nueva.append(0)
+                continue
+            if not 0 < node <= num_clientes or visto[node]:
+                continue
+            visto[node] = True
+            nueva.append(node)
+            carga += demands[node]
+        if nueva[-1] != 0:
+            nueva.append(0)
+        if len(nueva) > 2:
+            rutas.append(nueva)
+            cargas.append(carga)
+
+    # Paso 2: Reinsertar clientes faltantes respetando la capacidad
+    for cliente in range(1, num_clientes + 1):
+        if visto[cliente]:
+            continue
+        if dist_matrix is not None:
+            _insercion_mas_barata(rutas, cargas, cliente, dist_matrix, demands, capacidad)
+            continue
+        for ruta_idx in range(len(rutas)):
+            if cargas[ruta_idx] + demands[cliente] <= capacidad:
                 # Insertar antes del depósito final
-                solucion_final[ruta_idx].insert(len(solucion_final[ruta_idx]) - 1, cliente)
-                inserted = True
+                rutas[ruta_idx].insert(len(rutas[ruta_idx]) - 1, cliente)
+                cargas[ruta_idx] += demands[cliente]
                 break
+        else:
+            rutas.append([0, cliente, 0])
+            cargas.append(demands[cliente])
+
+    return rutas
+
+def _reparar_movimiento(estado, cambios, costo_total, num_clientes):
+    # Aplica un movimiento sobre el estado revisando solo las rutas que toca: si las rutas nuevas están bien
+    # formadas y contienen exactamente los mismos clientes que las que reemplazan, basta con quitar las rutas
+    # que quedaron vacías. Cualquier otra cosa se corrige con la reparación completa.
+    antes = []
+    despues = []
+    bien_formadas = True
+    for r_idx, ruta in cambios.items():
+        if len(ruta) < 2 or ruta[0] != 0 or ruta[-1] != 0:
+            bien_formadas = False
+            break
+        antes.extend(estado.rutas[r_idx][1:-1])
+        despues.extend(ruta[1:-1])
+    estado.aplicar(cambios, costo_total)
+
+    clientes = set(despues)
+    if bien_formadas and len(clientes) == len(despues) == len(antes) and clientes == set(antes):
+        if any(len(ruta) <= 2 for ruta in cambios.values()):
+            estado.eliminar_rutas_vacias()
+        return estado
+    return Solution(fix_solution(estado, num_clientes, estado.demands, estado.capacidad),
+                    estado.dist_matrix, estado.demands, estado.capacidad)
 
-        if not inserted:
-            solucion_final.append([0, cliente, 0])
-
-    # Paso 4: Eliminar rutas vacías resultantes ([0,0]) y asegurar unicidad
-    final_cleaned_solution = []
-    unique_route_tuples = set()
-    for ruta in solucion_final:
-        if len(ruta) > 2: # Solo añadir rutas que contengan al menos un cliente
-            route_tuple = tuple(ruta)
-            if route_tuple not in unique_route_tuples:
-                final_cleaned_solution.append(ruta)
-                unique_route_tuples.add(route_tuple)
-        elif len(ruta) == 2 and ruta[0] == 0 and ruta[1] == 0:
-             pass
-
-    if not final_cleaned_solution and num_clientes > 0:
-        for cliente in expected_customers:
-            final_cleaned_solution.append([0, cliente, 0])
-
-
-    return final_cleaned_solution
 def validate_solution(solucion, num_clientes, demands, capacidad):
+    cargas = None
+    if isinstance(solucion, Solution):
+        cargas = solucion.cargas
+        solucion = solucion.rutas
+
     all_nodes = []
     total_clientes = 0
 
     for ruta_idx, ruta in enumerate(solucion):
         if not ruta or ruta[0] != 0 or ruta[-1] != 0:
-            print(f" Error de formato en Ruta #{ruta_idx+1}: {ruta} (no empieza/termina en depósito).")
+            _logger.warning(" Error de formato en Ruta #%d: %s (no empieza/termina en depósito).", ruta_idx + 1, ruta)
             return False
 
         demandaRuta = 0
@@ -397,13 +1476,17 @@ def validate_solution(solucion, num_clientes, demands, capacidad):
         for i in range(len(ruta)):
             node = ruta[i]
             if node != 0:
-                demandaRuta += demands[node]
+                if cargas is None:
+                    demandaRuta += demands[node]
                 all_nodes.append(node)
                 nodes_in_route.append(node)
                 total_clientes += 1
+        if cargas is not None:
+            demandaRuta = cargas[ruta_idx]
 
         if demandaRuta > capacidad:
-            print(f" Error de capacidad en Ruta #{ruta_idx+1}: {ruta} (Demanda: {demandaRuta}, Capacidad: {capacidad}).")
+            _logger.warning(" Error de capacidad en Ruta #%d: %s (Demanda: %s, Capacidad: %s).",
+                            ruta_idx + 1, ruta, demandaRuta, capacidad)
             return False
 
     # Validar que todos los clientes esperados están presentes y no hay duplicados
@@ -414,83 +1497,1142 @@ def validate_solution(solucion, num_clientes, demands, capacidad):
         clientes_faltantes = clientes_esperados - clientes_actuales
         clientes_duplicados = clientes_actuales - clientes_esperados
 
-        print(f" Inconsistencia en clientes: {len(clientes_actuales)} únicos encontrados, {num_clientes} esperados.")
+        _logger.warning(" Inconsistencia en clientes: %d únicos encontrados, %d esperados.",
+                        len(clientes_actuales), num_clientes)
         if clientes_faltantes:
-            print(f"   Clientes faltantes: {sorted(list(clientes_faltantes))}")
+            _logger.warning("   Clientes faltantes: %s", sorted(clientes_faltantes))
         if clientes_duplicados:
-            print(f"   Clientes duplicados o extra (solo la primera instancia se cuenta aquí): {sorted(list(clientes_duplicados))}")
+            _logger.warning("   Clientes duplicados o extra (solo la primera instancia se cuenta aquí): %s",
+                            sorted(clientes_duplicados))
         return False
 
     # Contar ocurrencias para asegurar que cada cliente aparece solo una vez
     node_counts = Counter(all_nodes)
     for node, count in node_counts.items():
         if count > 1:
-            print(f" Cliente {node} aparece {count} veces (debería ser 1).")
+            _logger.warning(" Cliente %s aparece %d veces (debería ser 1).", node, count)
             return False
 
     return True
+# --- Perturbaciones (fase de shaking del VNS) ---
+# Cada perturbación recibe las rutas actuales y la intensidad k, y devuelve rutas nuevas
+# bien formadas y sin rutas vacías. La aleatoriedad sale del módulo `random` (reproducible con random.seed).
+def _insercion_mas_barata(rutas, cargas, cliente, dist_matrix, demands, capacidad):
+    # Inserta el cliente en la posición factible más barata; si no cabe en ninguna ruta abre una nueva
+    fila = dist_matrix[cliente]
+    mejor = None
+    for r_idx, ruta in enumerate(rutas):
+        if cargas[r_idx] + demands[cliente] > capacidad:
+            continue
+        for pos in range(1, len(ruta)):
+            p, q = ruta[pos-1], ruta[pos]
+            costo = dist_matrix[p][cliente] + fila[q] - dist_matrix[p][q]
+            if mejor is None or costo < mejor[0]:
+                mejor = (costo, r_idx, pos)
+
+    if mejor is None:
+        rutas.append([0, cliente, 0])
+        cargas.append(demands[cliente])
+        return len(rutas) - 1
+    _, r_idx, pos = mejor
+    rutas[r_idx].insert(pos, cliente)
+    cargas[r_idx] += demands[cliente]
+    return r_idx
+
+def _perturbar_relocate(rutas, k, dist_matrix, demands, capacidad):
+    # Mueve k clientes al azar a posiciones al azar de rutas con capacidad disponible
+    rutas = [ruta[:] for ruta in rutas]
+    cargas = [sum(demands[node] for node in ruta if node != 0) for ruta in rutas]
+    for _ in range(k):
+        origenes = [r_idx for r_idx, ruta in enumerate(rutas) if len(ruta) > 2]
+        if not origenes:
+            break
+        i = random.choice(origenes)
+        cliente = rutas[i].pop(random.randrange(1, len(rutas[i]) - 1))
+        cargas[i] -= demands[cliente]
+
+        destinos = [r_idx for r_idx in range(len(rutas))
+                    if r_idx != i and cargas[r_idx] + demands[cliente] <= capacidad]
+        destino = random.choice(destinos) if destinos else i
+        rutas[destino].insert(random.randrange(1, len(rutas[destino])), cliente)
+        cargas[destino] += demands[cliente]
+    return [ruta for ruta in rutas if len(ruta) > 2]
+
+def _perturbar_segmentos(rutas, k, dist_matrix, demands, capacidad, intentos=10):
+    # Intercambia un segmento de hasta k clientes de una ruta con otro de una segunda ruta
+    rutas = [ruta[:] for ruta in rutas]
+    if len(rutas) < 2:
+        return rutas
+    for _ in range(intentos):
+        r1, r2 = random.sample(range(len(rutas)), 2)
+        n_1, n_2 = len(rutas[r1]) - 2, len(rutas[r2]) - 2
+        if n_1 < 1 or n_2 < 1:
+            continue
+        largo_1 = random.randint(1, min(k, n_1))
+        largo_2 = random.randint(1, min(k, n_2))
+        i_1 = random.randint(1, n_1 - largo_1 + 1)
+        i_2 = random.randint(1, n_2 - largo_2 + 1)
+        seg_1 = rutas[r1][i_1:i_1 + largo_1]
+        seg_2 = rutas[r2][i_2:i_2 + largo_2]
+
+        demanda_1 = sum(demands[node] for node in seg_1)
+        demanda_2 = sum(demands[node] for node in seg_2)
+        carga_1 = sum(demands[node] for node in rutas[r1] if node != 0) - demanda_1 + demanda_2
+        carga_2 = sum(demands[node] for node in rutas[r2] if node != 0) - demanda_2 + demanda_1
+        if carga_1 <= capacidad and carga_2 <= capacidad:
+            rutas[r1][i_1:i_1 + largo_1] = seg_2
+            rutas[r2][i_2:i_2 + largo_2] = seg_1
+            break
+    return rutas
+
+def _perturbar_ruina(rutas, k, dist_matrix, demands, capacidad):
+    # Ruina y reconstrucción: quita un cliente al azar junto con sus k-1 clientes más cercanos
+    # y los reinserta en orden aleatorio, cada uno en su posición factible más barata
+    clientes = [node for ruta in rutas for node in ruta[1:-1]]
+    if not clientes:
+        return [ruta[:] for ruta in rutas]
+    fila = dist_matrix[random.choice(clientes)]
+    quitar = set(heapq.nsmallest(k, clientes, key=lambda node: (fila[node], node)))
+
+    rutas = [[node for node in ruta if node not in quitar] for ruta in rutas]
+    rutas = [ruta for ruta in rutas if len(ruta) > 2]
+    cargas = [sum(demands[node] for node in ruta if node != 0) for ruta in rutas]
+    orden = sorted(quitar)
+    random.shuffle(orden)
+    for cliente in orden:
+        _insercion_mas_barata(rutas, cargas, cliente, dist_matrix, demands, capacidad)
+    return rutas
+
+_PERTURBACIONES = {
+    "relocate": _perturbar_relocate,
+    "segmentos": _perturbar_segmentos,
+    "ruina": _perturbar_ruina,
+}
+
+# === Instrumentación ===
+# Capa opcional para diagnosticar corridas lentas: contadores por operador, histogramas de tiempo por
+# fase, captura de cProfile / tracemalloc por corrida y un flujo de eventos estructurados (diccionarios)
+# hacia un callback y/o un logger. Sin ella (instrumentacion=None) el VNS solo compara con None en cada fase.
+class Instrumentation:
+    def __init__(self, callback=None, logger=None, perfil=False, memoria=False, nivel_log=logging.DEBUG):
+        # callback: recibe cada evento como diccionario {"evento": tipo, ...}
+        # logger: Logger o nombre de logger; cada evento se emite con extra={"evento": diccionario}
+        # perfil / memoria: capturan cProfile y tracemalloc durante la corrida
+        self.callback = callback
+        self.logger = logging.getLogger(logger) if isinstance(logger, str) else logger
+        self.nivel_log = nivel_log
+        self.perfil = perfil
+        self.memoria = memoria
+        self.contadores = Counter() # evaluados.<operador>, aceptados.<operador>, shaking.<perturbación>, ...
+        self.fases = {} # fase -> {"llamadas", "total", "max", "histograma"}
+        self.estadisticas_perfil = None # pstats.Stats de la última corrida con perfil=True
+        self.instantanea_memoria = None # tracemalloc.Snapshot al terminar la corrida con memoria=True
+        self.memoria_pico = None # bytes
+        self._perfilador = None
+        self._detener_tracemalloc = False
+
+    def contar(self, nombre, cantidad=1):
+        self.contadores[nombre] += cantidad
+
+    def registrar(self, fase, segundos):
+        # Histograma en potencias de 2 microsegundos: la cubeta b cuenta las duraciones en [2^(b-1), 2^b) µs
+        registro = self.fases.get(fase)
+        if registro is None:
+            registro = self.fases[fase] = {"llamadas": 0, "total": 0.0, "max": 0.0, "histograma": Counter()}
+        registro["llamadas"] += 1
+        registro["total"] += segundos
+        if segundos > registro["max"]:
+            registro["max"] = segundos
+        registro["histograma"][int(segundos * 1e6).bit_length()] += 1
+
+    def evento(self, tipo, **datos):
+        datos["evento"] = tipo
+        if self.callback is not None:
+            self.callback(datos)
+        if self.logger is not None:
+            self.logger.log(self.nivel_log, "%s %s", tipo, datos, extra={"evento": datos})
+
+    def iniciar(self):
+        if self.perfil:
+            import cProfile
+            self._perfilador = cProfile.Profile()
+            self._perfilador.enable()
+        if self.memoria:
+            import tracemalloc
+            self._detener_tracemalloc = not tracemalloc.is_tracing()
+            if self._detener_tracemalloc:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+    def finalizar(self):
+        if self._perfilador is not None:
+            import pstats
+            self._perfilador.disable()
+            self.estadisticas_perfil = pstats.Stats(self._perfilador)
+            self._perfilador = None
+        if self.memoria:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                self.memoria_pico = tracemalloc.get_traced_memory()[1]
+                self.instantanea_memoria = tracemalloc.take_snapshot()
+                if self._detener_tracemalloc:
+                    tracemalloc.stop()
+
+    def resumen(self):
+        fases = {}
+        for fase, registro in self.fases.items():
+            fases[fase] = {
+                "llamadas": registro["llamadas"],
+                "total": registro["total"],
+                "media": registro["total"] / registro["llamadas"],
+                "max": registro["max"],
+                "histograma_us": {f"<{2 ** cubeta}": llamadas
+                                  for cubeta, llamadas in sorted(registro["histograma"].items())},
+            }
+        return {"contadores": dict(self.contadores), "fases": fases, "memoria_pico": self.memoria_pico}
+
 # --- Variable Neighborhood Search Completo (con estrategia VND) ---
-def variable_neighborhood_search(dist_matrix, demands, capacidad, max_iter=100, solucion_inicial=None):
+# Resultado de una búsqueda. Se puede desempaquetar e indexar como la tupla anterior:
+# `sol, costo = variable_neighborhood_search(...)`
+class VNSResult:
+    __slots__ = ("solucion", "costo", "iteraciones", "tiempo", "motivo", "estadisticas")
+
+    def __init__(self, solucion, costo, iteraciones, tiempo, motivo, estadisticas=None):
+        self.solucion = solucion
+        self.costo = costo
+        self.iteraciones = iteraciones
+        self.tiempo = tiempo
+        self.motivo = motivo # "max_iter", "tiempo", "sin_mejora", "convergencia", "callback", "cancelado" o "cache"
+        # Por operador: llamadas, mejoras, tiempo (s), movimientos evaluados y ganancia de costo acumulada
+        self.estadisticas = estadisticas or {}
+
+    def __iter__(self):
+        return iter((self.solucion, self.costo))
+
+    def __getitem__(self, indice):
+        return (self.solucion, self.costo)[indice]
+
+    def __len__(self):
+        return 2
+
+# Cada nuevo mejor global que produce vns_iter (iteración 0 = solución inicial)
+VNSProgress = namedtuple("VNSProgress", ["solucion", "costo", "iteracion", "tiempo", "estadisticas"])
+
+def _vnd(estado, neighborhood_operators, dist_matrix, demands, capacidad, vecinos, explorador, limite,
+         estrategias=None, estadisticas=None, instrumentacion=None, detener=None):
+    # Descenso de Vecindario Variable desde `estado`. Es un generador: entrega el estado tras cada
+    # movimiento aceptado y devuelve (estado_final, plazo_vencido) al terminar. `detener` (callable sin
+    # argumentos) interrumpe el descenso igual que el plazo cuando devuelve True.
+    # estrategias: {operador: "first" | "best"}; estadisticas: {operador: contadores} que se actualizan
+    # instrumentacion: Instrumentation que registra cada búsqueda, reparación y movimiento aceptado
+    num_clientes = len(demands) - 1
+    costo_actual = estado.costo_total
+    k = 0
+    while k < len(neighborhood_operators):
+        # El plazo y la cancelación se revisan entre llamadas a operadores
+        if (limite is not None and time.perf_counter() >= limite) or (detener is not None and detener()):
+            return estado, True
+        operador = neighborhood_operators[k]
+        primera_mejora = estrategias is not None and estrategias.get(operador) == "first"
+
+        # Buscar el mejor movimiento del vecindario (búsqueda local dentro de este vecindario)
+        inicio = time.perf_counter()
+        if explorador is not None:
+            neighbor_cost, cambios, evaluados = explorador.buscar(operador, estado, primera_mejora)
+        else:
+            neighbor_cost, cambios, evaluados = _BUSQUEDAS[operador](
+                estado, dist_matrix, demands, capacidad, vecinos, None, primera_mejora)
+        duracion = time.perf_counter() - inicio
+        mejora = cambios is not None and neighbor_cost < costo_actual
+
+        if instrumentacion is not None:
+            instrumentacion.registrar(f"busqueda.{operador}", duracion)
+            instrumentacion.contar(f"evaluados.{operador}", evaluados)
+            if mejora:
+                instrumentacion.contar(f"aceptados.{operador}")
+
+        if estadisticas is not None:
+            registro = estadisticas[operador]
+            registro["llamadas"] += 1
+            registro["tiempo"] += duracion
+            registro["evaluados"] += evaluados
+            if mejora:
+                registro["mejoras"] += 1
+                registro["ganancia"] += costo_actual - neighbor_cost
+
+        # Comprobar si se encontró una mejora
+        if mejora:
+            # Reparación acotada a las rutas que tocó el movimiento
+            inicio = time.perf_counter()
+            estado = _reparar_movimiento(estado, cambios, neighbor_cost, num_clientes)
+            if instrumentacion is not None:
+                instrumentacion.registrar("reparacion", time.perf_counter() - inicio)
+                instrumentacion.evento("movimiento", operador=operador, costo=estado.costo_total,
+                                       ganancia=costo_actual - estado.costo_total)
+
+            costo_actual = estado.costo_total
+            yield estado
+            k = 0
+        else:
+            # Pasar al siguiente operador de vecindario
+            k += 1
+    return estado, False
+
+def _estadisticas_operadores(nombres):
+    return {nombre: {"llamadas": 0, "mejoras": 0, "tiempo": 0.0, "evaluados": 0, "ganancia": 0.0}
+            for nombre in nombres}
+
+def _orden_adaptativo(neighborhood_operators, estadisticas):
+    # Primero los operadores con mayor tasa de éxito por segundo de búsqueda (con suavizado para
+    # los que aún no tienen historial); a igual puntaje se conserva el orden actual
+    def puntaje(nombre):
+        registro = estadisticas[nombre]
+        tasa_exito = (registro["mejoras"] + 1) / (registro["llamadas"] + 2)
+        tiempo_medio = registro["tiempo"] / registro["llamadas"] if registro["llamadas"] else 0.0
+        return tasa_exito / (tiempo_medio + 1e-6)
+    return sorted(neighborhood_operators, key=puntaje, reverse=True)
+
+def vns_iter(dist_matrix, demands, capacidad, max_iter=100, solucion_inicial=None,
+             vecinos_cercanos=None, verbose=True, procesos_vecindario=None,
+             tiempo_limite=None, max_sin_mejora=None,
+             perturbaciones=("relocate", "segmentos", "ruina"), k_min=1, k_max=10,
+             aceptacion="mejora", umbral=0.01, temperatura=None, enfriamiento=0.99,
+             estrategia="best", orden_adaptativo=False, constructor="random", coords=None,
+             instrumentacion=None, nivel_log=logging.INFO, detener=None):
+    # Generador "anytime": entrega un VNSProgress cada vez que mejora el mejor global y, al terminar,
+    # devuelve el VNSResult como valor de retorno del generador (StopIteration.value).
+    # tiempo_limite: segundos de reloj; al vencer se devuelve la mejor solución encontrada hasta ese momento
+    # max_sin_mejora: iteraciones consecutivas sin mejorar el mejor global antes de detenerse
+    # perturbaciones: nombres de _PERTURBACIONES usados en el shaking (vacío = VND repetido sin perturbar)
+    # k_min / k_max: intensidad del shaking; crece tras cada iteración sin mejora y vuelve a k_min al mejorar
+    # aceptacion: "mejora" (solo mejoras), "umbral" (hasta `umbral` relativo sobre el mejor global) o
+    #             "recocido" (empeoramientos con probabilidad exp(-delta / T), T *= enfriamiento por iteración;
+    #             sin `temperatura` se parte del 1% del costo inicial)
+    # estrategia: "best" (mejor mejora) o "first" (primera mejora), para todos los operadores o como
+    #             diccionario {operador: estrategia}
+    # orden_adaptativo: reordena los operadores del VND en cada iteración según su éxito y tiempo registrados
+    # constructor: método de generate_initial_solution cuando no se da solucion_inicial ("sweep" usa coords)
+    # instrumentacion: Instrumentation que recibe contadores, tiempos por fase y eventos de la corrida
+    # verbose / nivel_log: el progreso se emite por el logger "vrp_vns_optimizer" con ese nivel
+    # detener: callable sin argumentos que se consulta entre operadores del VND; si devuelve True la
+    #          búsqueda termina con la mejor solución hasta ese momento (motivo "cancelado")
+    if aceptacion not in ("mejora", "umbral", "recocido"):
+        raise ValueError(f"Criterio de aceptación desconocido: {aceptacion}")
+    perturbaciones = list(perturbaciones or ())
+    for nombre in perturbaciones:
+        if nombre not in _PERTURBACIONES:
+            raise ValueError(f"Perturbación desconocida: {nombre}")
+
+    inicio = time.perf_counter()
+    limite = inicio + tiempo_limite if tiempo_limite is not None else None
+
+    # Las listas de candidatos se construyen una vez y las usa también el constructor "savings"
+    dist_matrix = _matriz_para_busqueda(dist_matrix)
+    vecinos = nearest_neighbors(dist_matrix, vecinos_cercanos) if vecinos_cercanos else None
+
     if solucion_inicial is None:
-        solucion_actual = generate_initial_solution(demands, capacity)
+        solucion_actual = generate_initial_solution(demands, capacidad, constructor, dist_matrix, coords,
+                                                    vecinos_cercanos=vecinos)
     else:
         solucion_actual = [r[:] for r in solucion_inicial]
 
     # Asegurar que la solución inicial sea válida y consistente
     num_clientes = len(demands) - 1
-    solucion_actual = fix_solution(solucion_actual, num_clientes, demands, capacidad)
-    costo_actual = calculate_cost(solucion_actual, dist_matrix, demands, capacidad)
-
-    # Definir los operadores de vecindario a usar
-    neighborhood_operators = [
-        relocate,
-        swap,
-        two_opt,
-        interchange
-    ]
-
-    print(f"--- Iniciando VNS ---")
-    print(f"Costo inicial de la solución: {costo_actual:.2f}")
-
-    sol_global = [r[:] for r in solucion_actual]
-    costo_global = costo_actual
-
-    for iter_count in range(max_iter):
-
-        # Estrategia de Descenso de Vecindario Variable (VND)
-        k = 0
-        while k < len(neighborhood_operators):
-            operador = neighborhood_operators[k]
-
-            # Aplicar el operador de vecindario (búsqueda local dentro de este vecindario)
-            neighbor_sol = operador(solucion_actual, dist_matrix, demands, capacidad)
-
-           # Reparación de la solución
-            neighbor_sol = fix_solution(neighbor_sol, num_clientes, demands, capacidad)
-            neighbor_cost = calculate_cost(neighbor_sol, dist_matrix, demands, capacidad)
-
-            # Comprobar si se encontró una mejora
-            if neighbor_cost < costo_actual:
-                solucion_actual, costo_actual = neighbor_sol, neighbor_cost
-                if costo_actual < costo_global:
-                    sol_global, costo_global = [r[:] for r in solucion_actual], costo_actual
-                k = 0
+    solucion_actual = fix_solution(solucion_actual, num_clientes, demands, capacidad, dist_matrix)
+    estado = Solution(solucion_actual, dist_matrix, demands, capacidad)
+
+    # Definir los operadores de vecindario a usar (su búsqueda sobre el estado de la solución)
+    neighborhood_operators = list(_BUSQUEDAS)
+    if isinstance(estrategia, str):
+        estrategias = {nombre: estrategia for nombre in neighborhood_operators}
+    else:
+        estrategias = {nombre: estrategia.get(nombre, "best") for nombre in neighborhood_operators}
+    for nombre, valor in estrategias.items():
+        if valor not in ("first", "best"):
+            raise ValueError(f"Estrategia desconocida para {nombre}: {valor}")
+    estadisticas = _estadisticas_operadores(neighborhood_operators)
+
+    if verbose:
+        _logger.log(nivel_log, "--- Iniciando VNS ---")
+        _logger.log(nivel_log, "Costo inicial de la solución: %.2f", estado.costo_total)
+
+    sol_global = estado.como_lista()
+    costo_global = estado.costo_total
+    yield VNSProgress(sol_global, costo_global, 0, time.perf_counter() - inicio, estadisticas)
+
+    if temperatura is None:
+        temperatura = 0.01 * costo_global
+
+    # Con procesos_vecindario > 1 cada vecindario se reparte entre procesos y se reduce al mejor movimiento
+    explorador = None
+    if procesos_vecindario and procesos_vecindario > 1:
+        explorador = ParallelNeighborhood(dist_matrix, demands, capacidad, vecinos, procesos_vecindario)
+
+    motivo = "max_iter"
+    iteraciones = 0
+    sin_mejora = 0
+    k_shake = k_min
+    if instrumentacion is not None:
+        instrumentacion.iniciar()
+        instrumentacion.evento("inicio", costo=costo_global, clientes=num_clientes, rutas=len(estado.rutas))
+    try:
+        for iter_count in range(max_iter):
+            if limite is not None and time.perf_counter() >= limite:
+                motivo = "tiempo"
+                break
+            if detener is not None and detener():
+                motivo = "cancelado"
+                break
+            iteraciones = iter_count + 1
+            costo_global_previo = costo_global
+            inicio_iteracion = time.perf_counter()
+
+            # Shaking: perturbar la solución actual con intensidad k_shake (la primera iteración parte
+            # de la solución inicial sin perturbar)
+            if perturbaciones and iter_count > 0:
+                nombre_perturbacion = random.choice(perturbaciones)
+                # Las perturbaciones mueven clientes sin perderlos ni duplicarlos: no hace falta reparar
+                rutas = _PERTURBACIONES[nombre_perturbacion](estado.rutas, k_shake, dist_matrix, demands, capacidad)
+                candidato = Solution(rutas, dist_matrix, demands, capacidad)
+                if instrumentacion is not None:
+                    instrumentacion.registrar("shaking", time.perf_counter() - inicio_iteracion)
+                    instrumentacion.contar(f"shaking.{nombre_perturbacion}")
             else:
-                # Pasar al siguiente operador de vecindario
-                k += 1
-
-        if (iter_count + 1) % 50 == 0 or iter_count == max_iter -1:
-            print(f"--- Iteración {iter_count + 1}/{max_iter} ---")
-            print(f"Mejor costo global hasta ahora: {costo_global:.2f}")
-            print(f"Costo de la solución actual: {costo_actual:.2f}")
-            print("-" * 20)
-
-    print(f"--- VNS Finalizado ---")
-    print(f"Mejor costo global encontrado por VNS: {costo_global:.2f}")
-    return sol_global, costo_global
-# === Ejecutar ===
-if __name__ == "__main__":
-    file_path = "Facil.txt"
+                candidato = estado.copia()
+
+            # Estrategia de Descenso de Vecindario Variable (VND)
+            if orden_adaptativo:
+                neighborhood_operators = _orden_adaptativo(neighborhood_operators, estadisticas)
+            inicio_vnd = time.perf_counter()
+            descenso = _vnd(candidato, neighborhood_operators, dist_matrix, demands, capacidad,
+                            vecinos, explorador, limite, estrategias, estadisticas, instrumentacion, detener)
+            while True:
+                try:
+                    candidato = next(descenso)
+                except StopIteration as fin:
+                    candidato, plazo_vencido = fin.value
+                    break
+                if candidato.costo_total < costo_global:
+                    sol_global, costo_global = candidato.como_lista(), candidato.costo_total
+                    if instrumentacion is not None:
+                        instrumentacion.evento("mejor_global", costo=costo_global, iteracion=iteraciones,
+                                               tiempo=time.perf_counter() - inicio)
+                    yield VNSProgress(sol_global, costo_global, iteraciones, time.perf_counter() - inicio,
+                                      estadisticas)
+            if instrumentacion is not None:
+                instrumentacion.registrar("vnd", time.perf_counter() - inicio_vnd)
+
+            # Criterio de aceptación y tamaño del siguiente shaking
+            delta = candidato.costo_total - estado.costo_total
+            if delta < 0:
+                estado = candidato
+                k_shake = k_min
+            else:
+                if aceptacion == "umbral":
+                    aceptar = candidato.costo_total <= costo_global * (1 + umbral)
+                elif aceptacion == "recocido":
+                    aceptar = temperatura > 0 and random.random() < math.exp(-delta / temperatura)
+                else:
+                    aceptar = False
+                if aceptar:
+                    estado = candidato
+                k_shake = k_shake + 1 if k_shake < k_max else k_min
+            temperatura *= enfriamiento
+
+            if instrumentacion is not None:
+                instrumentacion.registrar("iteracion", time.perf_counter() - inicio_iteracion)
+                instrumentacion.contar("iteraciones")
+                instrumentacion.evento("iteracion", iteracion=iteraciones, costo_actual=estado.costo_total,
+                                       costo_global=costo_global, k=k_shake)
+
+            if verbose and ((iter_count + 1) % 50 == 0 or iter_count == max_iter -1):
+                _logger.log(nivel_log, "--- Iteración %d/%d ---", iter_count + 1, max_iter)
+                _logger.log(nivel_log, "Mejor costo global hasta ahora: %.2f", costo_global)
+                _logger.log(nivel_log, "Costo de la solución actual: %.2f", estado.costo_total)
+                _logger.log(nivel_log, "-" * 20)
+
+            if plazo_vencido:
+                motivo = "cancelado" if detener is not None and detener() else "tiempo"
+                break
+
+            sin_mejora = 0 if costo_global < costo_global_previo else sin_mejora + 1
+            if max_sin_mejora is not None and sin_mejora >= max_sin_mejora:
+                motivo = "sin_mejora"
+                break
+
+            # El VND termina en un óptimo local de todos los vecindarios: sin una perturbación entre
+            # iteraciones, la siguiente repetiría el mismo descenso sin cambiar nada.
+            if not perturbaciones and iteraciones < max_iter:
+                motivo = "convergencia"
+                break
+    finally:
+        if explorador is not None:
+            explorador.close()
+        if instrumentacion is not None:
+            instrumentacion.finalizar()
+
+    if instrumentacion is not None:
+        instrumentacion.evento("fin", motivo=motivo, costo=costo_global, iteraciones=iteraciones,
+                               tiempo=time.perf_counter() - inicio)
+    if verbose:
+        _logger.log(nivel_log, "--- VNS Finalizado ---")
+        _logger.log(nivel_log, "Mejor costo global encontrado por VNS: %.2f", costo_global)
+    return VNSResult(sol_global, costo_global, iteraciones, time.perf_counter() - inicio, motivo, estadisticas)
+
+def variable_neighborhood_search(dist_matrix, demands, capacidad, max_iter=100, solucion_inicial=None,
+                                 vecinos_cercanos=None, verbose=True, procesos_vecindario=None,
+                                 tiempo_limite=None, max_sin_mejora=None, callback=None, **opciones):
+    # vecinos_cercanos: k de las listas de candidatos (vecindarios granulares); None recorre los vecindarios completos
+    # verbose: emite el progreso por el logger "vrp_vns_optimizer" (nivel_log, INFO por defecto)
+    # procesos_vecindario: procesos que se reparten la exploración de cada vecindario (None = secuencial)
+    # tiempo_limite / max_sin_mejora: criterios de parada adicionales a max_iter (ver vns_iter)
+    # callback: se llama con cada VNSProgress; si devuelve True la búsqueda se detiene con lo mejor hasta ahora
+    # opciones: shaking (perturbaciones, k_min, k_max, aceptacion, umbral, temperatura, enfriamiento),
+    #           estrategia, orden_adaptativo, constructor, coords, instrumentacion, nivel_log y detener
+    #           (ver vns_iter)
+    busqueda = vns_iter(dist_matrix, demands, capacidad, max_iter, solucion_inicial, vecinos_cercanos,
+                        verbose, procesos_vecindario, tiempo_limite, max_sin_mejora, **opciones)
+    inicio = time.perf_counter()
+    ultimo = None
+    while True:
+        try:
+            ultimo = next(busqueda)
+        except StopIteration as fin:
+            return fin.value
+        if callback is not None and callback(ultimo):
+            busqueda.close()
+            if opciones.get("instrumentacion") is not None:
+                opciones["instrumentacion"].evento("fin", motivo="callback", costo=ultimo.costo,
+                                                   iteraciones=ultimo.iteracion, tiempo=time.perf_counter() - inicio)
+            return VNSResult(ultimo.solucion, ultimo.costo, ultimo.iteracion,
+                             time.perf_counter() - inicio, "callback", ultimo.estadisticas)
+
+# === Caché persistente de soluciones ===
+# Guarda la mejor solución de cada instancia resuelta en un directorio, con una entrada JSON por huella de
+# instancia (coordenadas, demandas y capacidad). Ante la misma instancia se devuelve la solución guardada;
+# ante una instancia parecida (mismo depósito, la mayoría de los clientes en las mismas coordenadas) se
+# adapta la solución previa: se quitan los clientes que ya no están, se descargan las rutas que quedan
+# sobre la capacidad y se insertan los clientes nuevos en su posición más barata. La matriz de distancias
+# se guarda aparte por huella de coordenadas (MemmapDistances) y se reutiliza mientras no cambien.
+# Las entradas se desalojan por antigüedad de uso (LRU, según la fecha de modificación, que se actualiza
+# en cada acierto) cuando se supera `max_entradas` soluciones o `max_bytes` en disco.
+_VERSION_CACHE_SOLUCIONES = 1
+
+# Resultado de SolutionCache.buscar: la solución (exacta o adaptada) y de dónde sale
+CachedStart = namedtuple("CachedStart", ["solucion", "exacta", "similitud", "costo_previo",
+                                         "eliminados", "nuevos"])
+
+def _huella_instancia(coords, demands, capacidad):
+    import hashlib
+    datos = repr(([(c[0], c[1]) for c in coords], list(demands), capacidad))
+    return hashlib.sha1(datos.encode()).hexdigest()
+
+def _adaptar_solucion(solucion, coords_previas, coords, demands, capacidad, dist_matrix):
+    # Traduce los clientes de la solución previa a los índices de la instancia nueva por coordenadas.
+    # Devuelve (rutas reparadas, clientes eliminados, clientes nuevos)
+    indices = {}
+    for node in range(1, len(coords)):
+        indices.setdefault((coords[node][0], coords[node][1]), []).append(node)
+
+    rutas = []
+    eliminados = 0
+    for ruta in solucion:
+        nueva = [0]
+        carga = 0
+        for node in ruta:
+            if node == 0:
+                continue
+            candidatos = indices.get((coords_previas[node][0], coords_previas[node][1]))
+            if not candidatos:
+                eliminados += 1
+                continue
+            nueva.append(candidatos.pop(0))
+            carga += demands[nueva[-1]]
+        # Si la demanda creció, se sacan clientes del final hasta respetar la capacidad: la reparación
+        # los vuelve a insertar donde quepan
+        while carga > capacidad and len(nueva) > 1:
+            carga -= demands[nueva.pop()]
+        nueva.append(0)
+        rutas.append(nueva)
+
+    nuevos = sum(len(restantes) for restantes in indices.values())
+    return fix_solution(rutas, len(demands) - 1, demands, capacidad, dist_matrix), eliminados, nuevos
+
+class SolutionCache:
+    def __init__(self, directorio, max_entradas=64, max_bytes=None, similitud_minima=0.5):
+        # similitud_minima: fracción de clientes en común (sobre la instancia más grande) para adaptar
+        self.directorio = directorio
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.similitud_minima = similitud_minima
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta_solucion(self, huella):
+        return os.path.join(self.directorio, f"sol-{huella}.json")
+
+    def _leer(self, ruta):
+        try:
+            with open(ruta, 'r') as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            return None # Entrada desalojada por otro proceso o ilegible
+        if entrada.get("version") != _VERSION_CACHE_SOLUCIONES:
+            return None
+        return entrada
+
+    def _tocar(self, ruta):
+        # Marca la entrada como usada recientemente para el LRU
+        try:
+            os.utime(ruta)
+        except OSError:
+            pass
+
+    def distancias(self, coords):
+        # Matriz EUC_2D con los mismos valores que euclidean_distance_matrix. Con NumPy es un MemmapDistances
+        # construido una sola vez por conjunto de coordenadas en `dist-<huella>.f64` y reabierto en las
+        # siguientes llamadas; sin NumPy, la lista de listas calculada cada vez. El memmap sirve para no
+        # recalcular la matriz: resolver la pasa a listas antes de buscar, que es lo rápido para los operadores.
+        if _numpy() is None:
+            return euclidean_distance_matrix(coords)
+        ruta = os.path.join(self.directorio, f"dist-{_huella_coordenadas(coords)}.f64")
+        existia = os.path.exists(ruta)
+        proveedor = MemmapDistances(coords, ruta, dtype="float64", backend="python")
+        if existia:
+            self._tocar(ruta)
+        else:
+            self._desalojar()
+        return proveedor
+
+    def buscar(self, coords, demands, capacidad, dist_matrix=None):
+        # Devuelve un CachedStart con la solución guardada de la misma instancia o la adaptación de la más
+        # parecida, o None si no hay ninguna lo bastante parecida
+        ruta = self._ruta_solucion(_huella_instancia(coords, demands, capacidad))
+        entrada = self._leer(ruta) if os.path.exists(ruta) else None
+        if entrada is not None:
+            self._tocar(ruta)
+            return CachedStart(entrada["solucion"], True, 1.0, entrada["costo"], 0, 0)
+
+        deposito = (coords[0][0], coords[0][1])
+        clientes = Counter((c[0], c[1]) for c in coords[1:])
+        mejor = None
+        for nombre in os.listdir(self.directorio):
+            if not (nombre.startswith("sol-") and nombre.endswith(".json")):
+                continue
+            entrada = self._leer(os.path.join(self.directorio, nombre))
+            if entrada is None or tuple(entrada["coords"][0]) != deposito:
+                continue
+            previos = Counter((c[0], c[1]) for c in entrada["coords"][1:])
+            comunes = sum((clientes & previos).values())
+            similitud = comunes / max(len(coords) - 1, len(entrada["coords"]) - 1, 1)
+            if similitud >= self.similitud_minima and (mejor is None or similitud > mejor[0]):
+                mejor = (similitud, nombre, entrada)
+        if mejor is None:
+            return None
+
+        similitud, nombre, entrada = mejor
+        self._tocar(os.path.join(self.directorio, nombre))
+        if dist_matrix is None:
+            dist_matrix = self.distancias(coords)
+        rutas, eliminados, nuevos = _adaptar_solucion(entrada["solucion"], entrada["coords"], coords,
+                                                      demands, capacidad, _filas_distancia(dist_matrix))
+        return CachedStart(rutas, False, similitud, entrada["costo"], eliminados, nuevos)
+
+    def guardar(self, coords, demands, capacidad, solucion, costo):
+        # Guarda la solución si la instancia no tiene una o si mejora la guardada
+        ruta = self._ruta_solucion(_huella_instancia(coords, demands, capacidad))
+        previa = self._leer(ruta) if os.path.exists(ruta) else None
+        if previa is not None and previa["costo"] <= costo:
+            self._tocar(ruta)
+            return False
+        entrada = {"version": _VERSION_CACHE_SOLUCIONES, "coords": [[c[0], c[1]] for c in coords],
+                   "demands": list(demands), "capacidad": capacidad, "solucion": solucion, "costo": costo}
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w') as f:
+            json.dump(entrada, f)
+        os.replace(temporal, ruta)
+        self._desalojar()
+        return True
+
+    def _desalojar(self):
+        # Agrupa cada archivo con sus auxiliares (la matriz y su .json de metadatos) y borra los grupos
+        # usados hace más tiempo hasta respetar los límites
+        grupos = {}
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith(".tmp"):
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                info = os.stat(ruta)
+            except OSError:
+                continue
+            grupo = grupos.setdefault(nombre.split(".", 1)[0], {"rutas": [], "bytes": 0, "uso": 0})
+            grupo["rutas"].append(ruta)
+            grupo["bytes"] += info.st_size
+            grupo["uso"] = max(grupo["uso"], info.st_mtime_ns)
+
+        soluciones = sum(clave.startswith("sol-") for clave in grupos)
+        total = sum(grupo["bytes"] for grupo in grupos.values())
+        for clave in sorted(grupos, key=lambda clave: grupos[clave]["uso"]):
+            exceso_entradas = self.max_entradas is not None and soluciones > self.max_entradas
+            exceso_bytes = self.max_bytes is not None and total > self.max_bytes
+            if not (exceso_entradas or exceso_bytes):
+                break
+            if not exceso_bytes and not clave.startswith("sol-"):
+                continue # Solo sobran soluciones: las matrices se quedan
+            for ruta in grupos[clave]["rutas"]:
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+            soluciones -= clave.startswith("sol-")
+            total -= grupos[clave]["bytes"]
+
+    def resolver(self, coords, demands, capacidad, reoptimizar=False, **opciones_vns):
+        # Resuelve con variable_neighborhood_search partiendo de la caché y guarda el resultado.
+        # Con la misma instancia ya resuelta se devuelve la solución guardada (motivo "cache") salvo que se
+        # pida reoptimizar; con una instancia parecida, la solución adaptada es la solución inicial del VNS.
+        inicio = time.perf_counter()
+        dist_matrix = _matriz_para_busqueda(self.distancias(coords))
+        previo = self.buscar(coords, demands, capacidad, dist_matrix)
+        if previo is not None and previo.exacta and not reoptimizar:
+            costo = calculate_cost(previo.solucion, dist_matrix, demands, capacidad)
+            return VNSResult(previo.solucion, costo, 0, time.perf_counter() - inicio, "cache")
+
+        if previo is not None:
+            opciones_vns["solucion_inicial"] = previo.solucion
+            if opciones_vns.get("verbose", True):
+                _logger.log(opciones_vns.get("nivel_log", logging.INFO),
+                            "Arranque desde la caché: similitud %.2f, %d clientes eliminados, %d nuevos",
+                            previo.similitud, previo.eliminados, previo.nuevos)
+        opciones_vns.setdefault("coords", coords)
+        resultado = variable_neighborhood_search(dist_matrix, demands, capacidad, **opciones_vns)
+        self.guardar(coords, demands, capacidad, resultado.solucion, resultado.costo)
+        return resultado
+
+# === VNS multi-arranque en paralelo ===
+# Cada arranque es una búsqueda VNS independiente con su propia semilla. La matriz de distancias
+# y las demandas llegan a cada proceso una sola vez mediante el inicializador del pool: con "fork"
+# se heredan sin serializar y con "spawn" se envían una vez por proceso, no por tarea.
+_DATOS_WORKER = {}
+
+def _inicializar_worker(dist_matrix, demands, capacidad, vecinos=None):
+    _DATOS_WORKER["dist_matrix"] = dist_matrix
+    _DATOS_WORKER["demands"] = demands
+    _DATOS_WORKER["capacidad"] = capacidad
+    _DATOS_WORKER["vecinos"] = vecinos
+
+def _vns_con_semilla(semilla, max_iter, opciones_vns):
+    random.seed(semilla)
+    inicio = time.perf_counter()
+    resultado = variable_neighborhood_search(
+        _DATOS_WORKER["dist_matrix"], _DATOS_WORKER["demands"], _DATOS_WORKER["capacidad"],
+        max_iter=max_iter, verbose=False, **opciones_vns
+    )
+    return {"semilla": semilla, "costo": resultado.costo, "tiempo": time.perf_counter() - inicio,
+            "iteraciones": resultado.iteraciones, "solucion": resultado.solucion}
+
+def _contexto_procesos():
+    # "fork" permite heredar la matriz sin copiarla por pickle; si no existe se usa el contexto por defecto
+    import multiprocessing
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+def multi_start_vns(dist_matrix, demands, capacidad, n_arranques=4, max_iter=100, semillas=None,
+                    max_workers=None, **opciones_vns):
+    # Devuelve (mejor_solucion, mejor_costo, estadisticas) con una entrada por semilla:
+    # {"semilla", "costo", "tiempo", "iteraciones"}. Las opciones extra se pasan a variable_neighborhood_search.
+    semillas = list(semillas) if semillas is not None else list(range(n_arranques))
+    if max_workers is None:
+        max_workers = min(len(semillas), os.cpu_count() or 1)
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=_contexto_procesos(),
+                             initializer=_inicializar_worker,
+                             initargs=(dist_matrix, demands, capacidad)) as pool:
+        resultados = list(pool.map(_vns_con_semilla, semillas,
+                                   [max_iter] * len(semillas), [opciones_vns] * len(semillas)))
+
+    mejor = min(resultados, key=lambda r: (r["costo"], semillas.index(r["semilla"])))
+    estadisticas = [{clave: valor for clave, valor in r.items() if clave != "solucion"} for r in resultados]
+    return mejor["solucion"], mejor["costo"], estadisticas
+
+# === Exploración paralela de un vecindario ===
+# Cada búsqueda del VND se reparte en bloques contiguos de rutas de origen (por ruta de origen en
+# relocate, por ruta en swap y two_opt, por la primera ruta del par en interchange). Cada bloque
+# devuelve su primer mejor movimiento y la reducción se queda con el de menor costo y, a igual
+# costo, con el del bloque más temprano: el mismo movimiento que elige el recorrido secuencial,
+# independiente del número de procesos.
+def _buscar_en_bloque(operador, rutas, indices, primera_mejora=False):
+    dist_matrix = _DATOS_WORKER["dist_matrix"]
+    demands = _DATOS_WORKER["demands"]
+    capacidad = _DATOS_WORKER["capacidad"]
+    estado = Solution(rutas, dist_matrix, demands, capacidad)
+    return _BUSQUEDAS[operador](estado, dist_matrix, demands, capacidad, _DATOS_WORKER["vecinos"], indices,
+                                primera_mejora)
+
+class ParallelNeighborhood:
+    def __init__(self, dist_matrix, demands, capacidad, vecinos=None, n_procesos=2, bloques_por_proceso=2):
+        self.n_bloques = n_procesos * bloques_por_proceso
+        from concurrent.futures import ProcessPoolExecutor
+        self.pool = ProcessPoolExecutor(max_workers=n_procesos, mp_context=_contexto_procesos(),
+                                        initializer=_inicializar_worker,
+                                        initargs=(dist_matrix, demands, capacidad, vecinos))
+
+    def buscar(self, operador, estado, primera_mejora=False):
+        # En modo primera mejora gana el bloque más temprano que encontró alguna mejora,
+        # que contiene la primera mejora del recorrido secuencial
+        n_rutas = len(estado.rutas)
+        tamano = max(1, -(-n_rutas // self.n_bloques))
+        bloques = [range(inicio, min(inicio + tamano, n_rutas)) for inicio in range(0, n_rutas, tamano)]
+        futuros = [self.pool.submit(_buscar_en_bloque, operador, estado.rutas, bloque, primera_mejora)
+                   for bloque in bloques]
+
+        mejor_costo, mejor_cambios, evaluados = estado.costo_total, None, 0
+        for futuro in futuros:
+            costo, cambios, evaluados_bloque = futuro.result()
+            evaluados += evaluados_bloque
+            if primera_mejora and mejor_cambios is not None:
+                continue
+            if cambios is not None and costo < mejor_costo:
+                mejor_costo, mejor_cambios = costo, cambios
+        return mejor_costo, mejor_cambios, evaluados
+
+    def close(self):
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# === Descomposición por grupos de rutas ===
+# Para instancias con miles de clientes: en cada ronda la solución se parte en grupos de rutas vecinas
+# y cada grupo se optimiza por separado con el VND, como un CVRP pequeño con su propia submatriz de
+# distancias (índices locales), en paralelo entre procesos. Las rutas mejoradas reemplazan a las del
+# grupo. Entre rondas la partición rota (estilo POPMUSIC) para que las fronteras entre grupos cambien.
+# Los grupos se forman por ángulo polar del centroide de cada ruta alrededor del depósito ("angulo",
+# grupos consecutivos que se desplazan media ventana por ronda) o por cercanía entre centroides
+# ("centroide", cada grupo es una ruta semilla y sus rutas más cercanas, con otra semilla inicial por ronda).
+_CRITERIOS_DESCOMPOSICION = ("angulo", "centroide")
+
+def _centroides_rutas(rutas, coords):
+    centroides = []
+    for ruta in rutas:
+        clientes = ruta[1:-1]
+        centroides.append((sum(coords[c][0] for c in clientes) / len(clientes),
+                           sum(coords[c][1] for c in clientes) / len(clientes)))
+    return centroides
+
+def _particionar_rutas(rutas, coords, rutas_por_grupo, criterio, ronda):
+    # Devuelve listas de índices de rutas; cada ruta queda en exactamente un grupo
+    centroides = _centroides_rutas(rutas, coords)
+    x_0, y_0 = coords[0]
+    orden = sorted(range(len(rutas)),
+                   key=lambda r: (math.atan2(centroides[r][1] - y_0, centroides[r][0] - x_0), r))
+    if len(rutas) <= rutas_por_grupo:
+        return [orden]
+
+    if criterio == "angulo":
+        desplazamiento = (ronda * max(1, rutas_por_grupo // 2)) % len(orden)
+        orden = orden[desplazamiento:] + orden[:desplazamiento]
+        return [orden[inicio:inicio + rutas_por_grupo] for inicio in range(0, len(orden), rutas_por_grupo)]
+
+    # "centroide": las semillas se toman en orden angular empezando en otra ruta cada ronda
+    inicio = (ronda * max(1, rutas_por_grupo // 2)) % len(orden)
+    pendientes = set(range(len(rutas)))
+    grupos = []
+    for semilla in orden[inicio:] + orden[:inicio]:
+        if semilla not in pendientes:
+            continue
+        x_s, y_s = centroides[semilla]
+        cercanas = sorted(pendientes, key=lambda r: (math.hypot(centroides[r][0] - x_s,
+                                                                centroides[r][1] - y_s), r))
+        grupo = cercanas[:rutas_por_grupo]
+        pendientes.difference_update(grupo)
+        grupos.append(grupo)
+    return grupos
+
+def _subproblema(rutas, dist_matrix, demands):
+    # Traduce un grupo de rutas a un CVRP con índices locales (0 = depósito)
+    nodos = [0] + [c for ruta in rutas for c in ruta[1:-1]]
+    local = {node: idx for idx, node in enumerate(nodos)}
+    if _es_matriz_numpy(dist_matrix):
+        submatriz = dist_matrix[np.ix_(nodos, nodos)].tolist()
+    else:
+        # float() deja la submatriz en floats de Python aunque la matriz venga de otro proveedor
+        submatriz = [[float(fila[b]) for b in nodos] for fila in (dist_matrix[a] for a in nodos)]
+    rutas_locales = [[local[node] for node in ruta] for ruta in rutas]
+    return nodos, rutas_locales, submatriz, [demands[node] for node in nodos]
+
+def _optimizar_grupo(rutas_locales, submatriz, subdemandas, capacidad, vecinos_cercanos, limite_reloj):
+    # VND sobre un subproblema; devuelve (rutas locales, costo, estadísticas por operador).
+    # limite_reloj: plazo absoluto de toda la descomposición en time.time(), comparable entre procesos;
+    # un grupo que empieza tarde (en serie o esperando en el pool) solo usa lo que queda
+    limite = None
+    if limite_reloj is not None:
+        limite = time.perf_counter() + (limite_reloj - time.time())
+    estado = Solution(rutas_locales, submatriz, subdemandas, capacidad)
+    k = min(vecinos_cercanos, len(subdemandas) - 1) if vecinos_cercanos else None
+    vecinos = nearest_neighbors(submatriz, k) if k else None
+    estadisticas = _estadisticas_operadores(_BUSQUEDAS)
+    descenso = _vnd(estado, list(_BUSQUEDAS), submatriz, subdemandas, capacidad, vecinos, None, limite,
+                    None, estadisticas)
+    while True:
+        try:
+            next(descenso)
+        except StopIteration as fin:
+            estado, _ = fin.value
+            break
+    return estado.como_lista(), estado.costo_total, estadisticas
+
+def decomposition_search(dist_matrix, demands, capacidad, coords, solucion_inicial=None, rutas_por_grupo=8,
+                         max_rondas=20, max_rondas_sin_mejora=2, criterio="angulo", procesos=None,
+                         vecinos_cercanos=None, tiempo_limite=None, constructor="savings", verbose=True,
+                         nivel_log=logging.INFO):
+    # rutas_por_grupo: rutas de cada subproblema; criterio: "angulo" o "centroide" (ver arriba)
+    # max_rondas_sin_mejora: rondas seguidas sin mejorar ningún grupo antes de detenerse (con 2, la
+    #                        partición desplazada también se revisa antes de declarar convergencia)
+    # procesos: procesos que optimizan grupos a la vez (None o 1 = en este proceso; el resultado es el mismo)
+    # Devuelve un VNSResult cuyas iteraciones son las rondas completadas
+    if criterio not in _CRITERIOS_DESCOMPOSICION:
+        raise ValueError(f"Criterio de descomposición desconocido: {criterio}")
+    if coords is None:
+        raise ValueError("La descomposición necesita las coordenadas de los nodos")
+    inicio = time.perf_counter()
+    limite = inicio + tiempo_limite if tiempo_limite is not None else None
+    limite_reloj = time.time() + tiempo_limite if tiempo_limite is not None else None
+
+    dist_matrix = _filas_distancia(dist_matrix)
+    num_clientes = len(demands) - 1
+    if solucion_inicial is None:
+        solucion_inicial = generate_initial_solution(demands, capacidad, constructor, dist_matrix, coords,
+                                                     vecinos_cercanos=vecinos_cercanos)
+    # Única reparación completa: los subproblemas conservan sus clientes
+    rutas = fix_solution(solucion_inicial, num_clientes, demands, capacidad, dist_matrix)
+    costo = calculate_cost(rutas, dist_matrix, demands, capacidad)
+    estadisticas = _estadisticas_operadores(_BUSQUEDAS)
+    if verbose:
+        _logger.log(nivel_log, "--- Iniciando descomposición: %d rutas, grupos de %d ---",
+                    len(rutas), rutas_por_grupo)
+        _logger.log(nivel_log, "Costo inicial de la solución: %.2f", costo)
+
+    pool = None
+    if procesos and procesos > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=procesos, mp_context=_contexto_procesos())
+
+    motivo = "max_iter"
+    rondas = 0
+    sin_mejora = 0
+    try:
+        for ronda in range(max_rondas):
+            if limite is not None and time.perf_counter() >= limite:
+                motivo = "tiempo"
+                break
+            grupos = _particionar_rutas(rutas, coords, rutas_por_grupo, criterio, ronda)
+            subproblemas = [_subproblema([rutas[r] for r in grupo], dist_matrix, demands) for grupo in grupos]
+            argumentos = [(rutas_locales, submatriz, subdemandas, capacidad, vecinos_cercanos, limite_reloj)
+                          for _, rutas_locales, submatriz, subdemandas in subproblemas]
+            if pool is not None:
+                resultados = [futuro.result() for futuro in
+                              [pool.submit(_optimizar_grupo, *args) for args in argumentos]]
+            else:
+                resultados = [_optimizar_grupo(*args) for args in argumentos]
+
+            # Fusión: cada grupo aporta sus rutas (las vacías se descartan), en el orden de los grupos
+            nuevas = []
+            for (nodos, _, _, _), (rutas_locales, _, estadisticas_grupo) in zip(subproblemas, resultados):
+                nuevas.extend([nodos[node] for node in ruta] for ruta in rutas_locales if len(ruta) > 2)
+                for nombre, registro in estadisticas_grupo.items():
+                    for campo, valor in registro.items():
+                        estadisticas[nombre][campo] += valor
+            costo_nuevo = calculate_cost(nuevas, dist_matrix, demands, capacidad)
+            rondas = ronda + 1
+            if costo_nuevo < costo - _TOLERANCIA_DELTA:
+                rutas, costo = nuevas, costo_nuevo
+                sin_mejora = 0
+            else:
+                sin_mejora += 1
+            if verbose:
+                _logger.log(nivel_log, "Ronda %d: %d grupos, costo %.2f", rondas, len(grupos), costo)
+            if limite is not None and time.perf_counter() >= limite:
+                motivo = "tiempo"
+                break
+            if sin_mejora >= max_rondas_sin_mejora:
+                motivo = "convergencia"
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if verbose:
+        _logger.log(nivel_log, "--- Descomposición finalizada: costo %.2f ---", costo)
+    return VNSResult(rutas, costo, rondas, time.perf_counter() - inicio, motivo, estadisticas)
+
+# === Visualización (opcional) ===
+# matplotlib se importa solo al graficar; no es una dependencia del solver
+def plot_solution(solucion, coords, titulo=None, ruta_archivo=None, mostrar=False):
+    # Dibuja cada ruta con su propio color y el depósito (nodo 0) destacado; devuelve (figura, ejes)
+    try:
+        import matplotlib.pyplot as plt
+    except ImportError:
+        raise ImportError("plot_solution requiere tener matplotlib instalado") from None
+    if isinstance(solucion, Solution):
+        solucion = solucion.rutas
+
+    figura, ejes = plt.subplots()
+    for numero, ruta in enumerate(solucion, start=1):
+        if len(ruta) <= 2:
+            continue
+        ejes.plot([coords[node][0] for node in ruta], [coords[node][1] for node in ruta],
+                  marker="o", markersize=3, linewidth=1, label=f"Ruta #{numero}")
+    ejes.plot(coords[0][0], coords[0][1], marker="s", markersize=8, color="black", linestyle="none",
+              label="Depósito")
+    if titulo:
+        ejes.set_title(titulo)
+    ejes.set_aspect("equal", adjustable="datalim")
+    if ruta_archivo:
+        figura.savefig(ruta_archivo, bbox_inches="tight")
+    if mostrar:
+        plt.show()
+    return figura, ejes
+
+# === Línea de comandos ===
+# python vrp_vns_optimizer.py Facil.txt Medio.txt instancias/ --workers 4 --formato csv --salida resultados.csv
+# Cada instancia se resuelve en su propio proceso (hasta --workers a la vez) y su resultado se escribe
+# en cuanto termina, como una línea JSON o una fila CSV. Sin instancias se ejecuta la demostración original.
+_EXTENSIONES_INSTANCIA = (".vrp", ".txt")
+_CAMPOS_RESULTADO = ["instancia", "nombre", "costo", "mejor_conocido", "gap", "tiempo", "iteraciones",
+                     "motivo", "valida", "rutas", "error"]
+
+def _expandir_instancias(rutas):
+    # Archivos tal cual; de cada directorio, sus archivos .vrp / .txt en orden alfabético
+    archivos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            archivos.extend(os.path.join(ruta, nombre) for nombre in sorted(os.listdir(ruta))
+                            if nombre.lower().endswith(_EXTENSIONES_INSTANCIA))
+        else:
+            archivos.append(ruta)
+    return archivos
+
+def _resolver_instancia(ruta, semilla, cache, opciones_vns, cache_soluciones=None):
+    inicio = time.perf_counter()
+    registro = {"instancia": ruta}
+    try:
+        instancia = read_cvrp_instance(ruta, cache=cache or None, con_matriz=bool(cache))
+        random.seed(semilla)
+        if cache_soluciones and instancia.tipo_distancia == "EUC_2D":
+            resultado = SolutionCache(cache_soluciones).resolver(instancia.coords, instancia.demands,
+                                                                 instancia.capacidad, verbose=False,
+                                                                 **opciones_vns)
+        else:
+            resultado = variable_neighborhood_search(instancia.distancias(), instancia.demands,
+                                                     instancia.capacidad, verbose=False,
+                                                     coords=instancia.coords, **opciones_vns)
+        mejor_conocido = instancia.mejor_conocido
+        valida = validate_solution(resultado.solucion, len(instancia.demands) - 1, instancia.demands,
+                                   instancia.capacidad)
+        registro.update(
+            nombre=instancia.nombre,
+            costo=resultado.costo,
+            mejor_conocido=mejor_conocido,
+            gap=100 * (resultado.costo - mejor_conocido) / mejor_conocido if mejor_conocido else None,
+            iteraciones=resultado.iteraciones,
+            motivo=resultado.motivo,
+            valida=valida,
+            rutas=resultado.solucion,
+        )
+    except Exception as error: # Una instancia defectuosa no detiene el resto del lote
+        registro["error"] = f"{type(error).__name__}: {error}"
+    registro["tiempo"] = time.perf_counter() - inicio
+    return registro
+
+def _escritor_resultados(formato, salida):
+    if formato == "jsonl":
+        def escribir(registro):
+            salida.write(json.dumps(registro) + "\n")
+            salida.flush()
+        return escribir
+
+    import csv
+    escritor = csv.DictWriter(salida, fieldnames=_CAMPOS_RESULTADO)
+    escritor.writeheader()
+    def escribir(registro):
+        fila = dict(registro)
+        if "rutas" in fila:
+            fila["rutas"] = json.dumps(fila["rutas"])
+        escritor.writerow(fila)
+        salida.flush()
+    return escribir
+
+def _argumentos_cli():
+    import argparse
+    parser = argparse.ArgumentParser(description="Resuelve instancias CVRP con VNS.")
+    parser.add_argument("instancias", nargs="*",
+                        help="archivos de instancia o directorios (se toman sus .vrp y .txt)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="instancias resueltas a la vez (por defecto, una por CPU)")
+    parser.add_argument("--formato", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--salida", default=None, help="archivo de resultados (por defecto, la salida estándar)")
+    parser.add_argument("--max-iter", type=int, default=100)
+    parser.add_argument("--tiempo-limite", type=float, default=None, help="segundos por instancia")
+    parser.add_argument("--max-sin-mejora", type=int, default=None)
+    parser.add_argument("--constructor", choices=sorted(_CONSTRUCTORES), default="savings")
+    parser.add_argument("--vecinos-cercanos", type=int, default=None,
+                        help="k de los vecindarios granulares (por defecto, vecindarios completos)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--cache", action="store_true",
+                        help="reutiliza una caché .npz de cada instancia (requiere NumPy)")
+    parser.add_argument("--cache-soluciones", default=None, metavar="DIRECTORIO",
+                        help="parte de la solución guardada de la misma instancia o de una parecida "
+                             "(solo EUC_2D) y guarda la nueva")
+    parser.add_argument("--nivel-log", default="INFO", choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+                        help="nivel de los mensajes de progreso y validación (van a la salida de errores)")
+    return parser
+
+def main(argv=None):
+    args = _argumentos_cli().parse_args(argv)
+    logging.basicConfig(level=args.nivel_log, format="%(message)s")
+    if not args.instancias:
+        _demo("Facil.txt")
+        return 0
+
+    archivos = _expandir_instancias(args.instancias)
+    opciones_vns = {"max_iter": args.max_iter, "tiempo_limite": args.tiempo_limite,
+                    "max_sin_mejora": args.max_sin_mejora, "constructor": args.constructor,
+                    "vecinos_cercanos": args.vecinos_cercanos}
+    workers = args.workers or min(len(archivos), os.cpu_count() or 1)
+
+    salida = open(args.salida, 'w', newline='') if args.salida else sys.stdout
+    errores = 0
+    try:
+        escribir = _escritor_resultados(args.formato, salida)
+        if workers <= 1:
+            registros = (_resolver_instancia(ruta, args.semilla, args.cache, opciones_vns, args.cache_soluciones)
+                         for ruta in archivos)
+            for registro in registros:
+                errores += "error" in registro
+                escribir(registro)
+        else:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_contexto_procesos()) as pool:
+                futuros = [pool.submit(_resolver_instancia, ruta, args.semilla, args.cache, opciones_vns,
+                                       args.cache_soluciones)
+                           for ruta in archivos]
+                for futuro in as_completed(futuros):
+                    registro = futuro.result()
+                    errores += "error" in registro
+                    escribir(registro)
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+    return 1 if errores else 0
+
+def _demo(file_path):
+    # Demostración original: resuelve una instancia e imprime las rutas inicial y final
     dimension, capacity, coords, demands, depot = read_cvrp_file(file_path)
     dist_matrix = euclidean_distance_matrix(coords)
 
@@ -499,7 +2641,7 @@ if __name__ == "__main__":
     sol_inicial = generate_initial_solution(demands, capacity)
 
     # Es crucial arreglar y validar la solución inicial antes de pasarla a VNS
-    sol_inicial = fix_solution(sol_inicial, num_clientes, demands, capacity)
+    sol_inicial = fix_solution(sol_inicial, num_clientes, demands, capacity, dist_matrix)
     costo_inicial = calculate_cost(sol_inicial, dist_matrix, demands, capacity)
 
     print("\nSolución Inicial:")
@@ -524,7 +2666,7 @@ if __name__ == "__main__":
     )
 
     # Asegurar la validez de la solución final
-    sol_final = fix_solution(sol_final, num_clientes, demands, capacity)
+    sol_final = fix_solution(sol_final, num_clientes, demands, capacity, dist_matrix)
 
     print("\n--- Mejor Solución Encontrada por VNS ---")
     ruta_num = 1
@@ -539,4 +2681,8 @@ if __name__ == "__main__":
         print(" La Solución Final es VÁLIDA.")
     else:
         print(" La solución Final no es Válida")
-    print("-" * 50)
\ No newline at end of file
+    print("-" * 50)
+
+# === Ejecutar ===
+if __name__ == "__main__":
+    sys.exit(main())